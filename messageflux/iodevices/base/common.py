@@ -4,22 +4,35 @@ from typing import BinaryIO, Dict, Any, Optional, Union
 
 MessageHeaders = Dict[str, Any]  # this is the type for message metadata
 
+_IMMUTABLE_HEADER_TYPES = frozenset((str, int, float, bool, bytes, type(None)))
+
+
+def _deepcopy_headers(headers: MessageHeaders, memo=None) -> MessageHeaders:
+    """
+    deep copies the headers. skips the deepcopy machinery when all the values are immutable
+    """
+    if all(type(value) in _IMMUTABLE_HEADER_TYPES for value in headers.values()):
+        return dict(headers)
+    return copy.deepcopy(headers, memo)
+
 
 class Message:
     """
     this class is the basic unit that is read from, or sent to devices.
     """
-    __slots__ = '_stream', '_headers'
+    __slots__ = '_raw', '_stream', '_headers'
 
     def __init__(self, data: Union[BinaryIO, bytes], headers: Optional[MessageHeaders] = None):
         """
         :param data: the bytes/stream containing the body of the message
         :param headers: (optional) headers containing metadata about the message
         """
+        self._raw: Optional[bytes] = None
+        self._stream: Optional[BinaryIO] = None
         if isinstance(data, bytes):
-            data = BytesIO(data)
-
-        self._stream = data
+            self._raw = data  # the stream is created lazily, on first access
+        else:
+            self._stream = data
         self._headers = headers or {}
 
     @property
@@ -27,6 +40,8 @@ class Message:
         """
         the stream for this message. notice that reading the stream, advances its position
         """
+        if self._stream is None:
+            self._stream = BytesIO(self._raw)  # type: ignore
         return self._stream
 
     @property
@@ -35,6 +50,8 @@ class Message:
         :return: the data of the message
         (reads the stream from current position to the end, than resets the position to the original value)
         """
+        if self._stream is None:
+            return self._raw  # type: ignore
         current_pos = self._stream.tell()
         data = self._stream.read()
         self._stream.seek(current_pos)
@@ -51,11 +68,16 @@ class Message:
         """
         makes a copy of the message, possibly giving it a new headers
         """
-        stream_copy = copy.copy(self._stream)
-        stream_copy.seek(0)
         if new_headers is None:
             new_headers = self._headers.copy()
+        if self._stream is None:
+            return Message(self._raw, new_headers)  # type: ignore
+        if isinstance(self._stream, BytesIO):
+            # getvalue() shares the underlying buffer when it can, so the payload is not copied
+            return Message(self._stream.getvalue(), new_headers)
 
+        stream_copy = copy.copy(self._stream)
+        stream_copy.seek(0)
         return Message(stream_copy, new_headers)
 
     def __eq__(self, other):
@@ -68,9 +90,11 @@ class Message:
         return self.copy()
 
     def __deepcopy__(self, memo=None):
+        if self._stream is None:
+            return Message(self._raw, _deepcopy_headers(self._headers, memo))  # type: ignore
         stream_copy = copy.deepcopy(self._stream, memo)
         stream_copy.seek(0)
-        return Message(stream_copy, copy.deepcopy(self._headers, memo))
+        return Message(stream_copy, _deepcopy_headers(self._headers, memo))
 
 
 DeviceHeaders = Dict[str, Any]  # this is the type for device specific headers, used to pass arguments to/from device
@@ -88,7 +112,7 @@ class MessageBundle:
         :param device_headers: Additional Headers that may return data from device, or affect its operation.
         """
         self._message = message
-        self._device_headers = device_headers or {}
+        self._device_headers = device_headers if device_headers is not None else {}
 
     @property
     def message(self) -> Message:
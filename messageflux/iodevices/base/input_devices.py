@@ -1,16 +1,22 @@
 import logging
+import select
+import sys
 import threading
 from abc import ABCMeta, abstractmethod
 from time import perf_counter
-from typing import Optional, List, TypeVar, Generic, Dict
+from typing import Optional, List, TypeVar, Generic, Dict, Callable, Tuple
 
 from messageflux.iodevices.base.common import MessageBundle, Message, DeviceHeaders
 from messageflux.iodevices.base.input_transaction import InputTransaction, NULLTransaction
-from messageflux.utils import StatefulListIterator, AggregatedException
+from messageflux.utils import AggregatedException
 
 TManagerType = TypeVar('TManagerType', bound='InputDeviceManager')
 TInputDeviceType = TypeVar('TInputDeviceType', bound='InputDevice')
 
+_INPUT_DEVICE_NAME_HEADER = "__INPUT_DEVICE_NAME__"
+
+_logger = logging.getLogger(__name__)
+
 
 class InputDeviceException(AggregatedException):
     """
@@ -23,7 +29,7 @@ class InputDevice(Generic[TManagerType], metaclass=ABCMeta):
     """
     this is the base class for input devices
     """
-    INPUT_DEVICE_NAME_HEADER = "__INPUT_DEVICE_NAME__"
+    INPUT_DEVICE_NAME_HEADER = _INPUT_DEVICE_NAME_HEADER
 
     def __init__(self, manager: TManagerType, name: str):
         """
@@ -75,10 +81,54 @@ class InputDevice(Generic[TManagerType], metaclass=ABCMeta):
                                          timeout=timeout,
                                          with_transaction=with_transaction)
         if read_result is not None:
-            read_result.device_headers.setdefault(self.INPUT_DEVICE_NAME_HEADER, self.name)
+            device_headers = read_result.device_headers
+            if _INPUT_DEVICE_NAME_HEADER not in device_headers:
+                device_headers[_INPUT_DEVICE_NAME_HEADER] = self._name
 
         return read_result
 
+    def read_messages(self,
+                      cancellation_token: threading.Event,
+                      timeout: Optional[float] = None,
+                      max_batch: int = 1,
+                      with_transaction: bool = True) -> List['ReadResult']:
+        """
+        this method returns up to max_batch messages that are available on the device.
+        it waits (up to 'timeout') for the first message only, and then returns the messages that are already available.
+        devices that can read several messages at once should override this method.
+        the default implementation calls 'read_message' until the device is empty, or max_batch messages were read.
+        if a read fails after some messages were already read, those messages are returned (so that their
+        transactions are not lost), and the error is raised by the next read
+
+        :param cancellation_token: the cancellation token for this service. this can be used to know if cancellation
+        was requested
+
+        :param timeout: an optional timeout (in seconds) to wait for the device to return the first message.
+        after 'timeout' seconds, if the device doesn't have a message to return, it will return an empty list
+        :param max_batch: the maximum number of messages to return
+        :param with_transaction: 'True' if the device should read messages within transaction,
+        or 'False' if the messages are automatically committed
+
+        :return: a list of ReadResult objects (empty if no message was available)
+        """
+        read_results: List['ReadResult'] = []
+        while len(read_results) < max_batch:
+            try:
+                read_result = self.read_message(cancellation_token=cancellation_token,
+                                                timeout=timeout if not read_results else 0,
+                                                with_transaction=with_transaction)
+            except Exception:
+                if not read_results:
+                    raise
+                _logger.warning(f'Error reading from device {self._name}. returning the messages already read',
+                                exc_info=True)
+                break
+            if read_result is None:
+                break
+            read_results.append(read_result)
+
+        return read_results
+
     @abstractmethod
     def _read_message(self,
                       cancellation_token: threading.Event,
@@ -101,6 +151,57 @@ class InputDevice(Generic[TManagerType], metaclass=ABCMeta):
         """
         pass
 
+    def commit_batch(self, transactions: List[InputTransaction]) -> None:
+        """
+        commits a batch of transactions that were returned by this device.
+        devices that can commit several messages at once (i.e in a single request) should override this method,
+        and mark the transactions as finished. the default implementation commits the transactions one by one
+
+        :param transactions: the transactions to commit
+        """
+        for transaction in transactions:
+            transaction.commit()
+
+    def rollback_batch(self, transactions: List[InputTransaction]) -> None:
+        """
+        rolls back a batch of transactions that were returned by this device.
+        devices that can rollback several messages at once (i.e in a single request) should override this method,
+        and mark the transactions as finished. the default implementation rolls back the transactions one by one
+
+        :param transactions: the transactions to rollback
+        """
+        for transaction in transactions:
+            transaction.rollback()
+
+    def fileno(self) -> Optional[int]:
+        """
+        returns a file descriptor that becomes readable when a message may be available on the device.
+        this allows readers to wait on several devices with a single system call, instead of polling them.
+        devices that are backed by a file descriptor (i.e a socket) may override this method
+
+        :return: the file descriptor, or None if the device is not backed by one
+        """
+        return None
+
+    def register_ready_callback(self, callback: Callable[[], None]) -> bool:
+        """
+        registers a callback that the device calls when a new message may be available for reading.
+        this allows readers to wait for messages, instead of polling the device.
+        devices that support it should override this method (and 'unregister_ready_callback')
+
+        :param callback: the callback to call when a message may be available
+        :return: True if the device supports ready notifications, False otherwise
+        """
+        return False
+
+    def unregister_ready_callback(self, callback: Callable[[], None]) -> None:
+        """
+        unregisters a callback that was registered using 'register_ready_callback'
+
+        :param callback: the callback to unregister
+        """
+        pass
+
     def close(self):
         """
         and optional method that cleans device resources if necessary
@@ -110,23 +211,86 @@ class InputDevice(Generic[TManagerType], metaclass=ABCMeta):
 
 class AggregatedInputDevice(InputDevice[TManagerType]):
     """
-    this class is a round-robin input device, that reads from several underlying input devices in order
+    this class is a round-robin input device, that reads from several underlying input devices in order.
+
+    if priorities are given, the devices are always checked by priority order instead (highest first).
+    this means that high priority devices are checked first on every read, and low priority devices are read only when
+    all the higher priority devices are empty (so they may starve while higher priority devices have messages)
     """
-    # the amount in seconds to sleep between iterations. otherwise, we perform busy wait if all devices are empty
+    # the maximum time in seconds to sleep between iterations. otherwise, we perform busy wait if all devices are empty
+    # (devices that support ready notifications or file descriptors wake the aggregate before that)
     _SLEEP_BETWEEN_ITERATIONS: float = 0.1
+    # the first sleep after the devices became empty. it is doubled on every empty pass (up to
+    # _SLEEP_BETWEEN_ITERATIONS), and reset when a message is read. so bursty devices are polled quickly after a
+    # message, and idle devices are not polled too often
+    _MIN_SLEEP_BETWEEN_ITERATIONS: float = 0.001
 
-    def __init__(self, manager: TManagerType, inner_devices: List[InputDevice]):
+    def __init__(self,
+                 manager: TManagerType,
+                 inner_devices: List[InputDevice],
+                 priorities: Optional[List[int]] = None):
         """
         :param manager: the input device manager that created this device
         :param inner_devices: the list of input devices to read from
+        :param priorities: optional priorities for the inner devices (higher value is read first).
+        None means that the devices are read in round-robin order
         """
         super().__init__(manager=manager,
                          name="AggregateInputDevice")
 
-        self._inner_devices_iterator: StatefulListIterator[InputDevice] = StatefulListIterator(inner_devices)
+        self._inner_devices: Tuple[InputDevice, ...]
+        self._round_robin = priorities is None
+        self._next_device_index = 0  # the index of the device to start the next pass from (in round-robin mode)
+        if priorities is None:
+            self._inner_devices = tuple(inner_devices)
+        else:
+            if len(priorities) != len(inner_devices):
+                raise InputDeviceException('The number of priorities must match the number of inner devices')
+            devices_by_priority = sorted(zip(priorities, inner_devices), key=lambda item: -item[0])
+            self._inner_devices = tuple(device for _, device in devices_by_priority)
+        if len(self._inner_devices) == 1:
+            self._read_single_pass = self._read_single_device  # type: ignore
         self._last_read_device: Optional[InputDevice] = None
+        self._last_read_devices: List[InputDevice] = []
+        self._idle_sleep_time = self._MIN_SLEEP_BETWEEN_ITERATIONS
         self._logger = logging.getLogger(__name__)
 
+        self._ready = threading.Event()
+        self._on_device_ready = self._ready.set
+        self._has_ready_notifications = False
+        for inner_device in inner_devices:
+            if inner_device.register_ready_callback(self._on_device_ready):
+                self._has_ready_notifications = True
+
+        self._epoll = None
+        self._epoll_max_events = len(self._inner_devices)
+        if sys.platform == 'linux':
+            self._epoll = self._create_epoll()
+
+    def _create_epoll(self) -> Optional['select.epoll']:
+        """
+        creates an (edge triggered) epoll object on the file descriptors of the inner devices.
+        the registrations are persistent, so nothing is re-armed between waits,
+        and a single wait reaps the events of all the ready devices at once
+
+        :return: the epoll object, or None if some of the inner devices are not backed by file descriptors
+        (or if there are no inner devices)
+        """
+        if not self._inner_devices:
+            return None
+        file_descriptors = set()
+        for inner_device in self._inner_devices:
+            file_descriptor = inner_device.fileno()
+            if file_descriptor is None:
+                return None
+            file_descriptors.add(file_descriptor)
+
+        self._epoll_max_events = len(file_descriptors)
+        epoll = select.epoll()
+        for file_descriptor in file_descriptors:
+            epoll.register(file_descriptor, select.EPOLLIN | select.EPOLLET)
+        return epoll
+
     @property
     def last_read_device(self) -> Optional[InputDevice]:
         """
@@ -134,6 +298,100 @@ class AggregatedInputDevice(InputDevice[TManagerType]):
         """
         return self._last_read_device
 
+    @property
+    def last_read_devices(self) -> List[InputDevice]:
+        """
+        :return: the devices that returned the messages of the last 'read_messages' call (in the same order)
+        """
+        return self._last_read_devices
+
+    def read_messages(self,
+                      cancellation_token: threading.Event,
+                      timeout: Optional[float] = None,
+                      max_batch: int = 1,
+                      with_transaction: bool = True) -> List['ReadResult']:
+        """
+        this method returns up to max_batch messages from the inner devices.
+        it waits (up to 'timeout') for the first message only, and then collects the messages that are already
+        available on the inner devices, in the same order that 'read_message' would have returned them.
+        the devices that returned the messages are available in 'last_read_devices'
+
+        :param cancellation_token: the cancellation token for this service. this can be used to know if cancellation
+        was requested
+
+        :param timeout: an optional timeout (in seconds) to wait for the first message.
+        after 'timeout' seconds, if no device has a message to return, it will return an empty list
+        :param max_batch: the maximum number of messages to return
+        :param with_transaction: 'True' if the devices should read messages within transaction,
+        or 'False' if the messages are automatically committed
+
+        :return: a list of ReadResult objects (empty if no message was available)
+        """
+        last_read_devices: List[InputDevice] = []
+        self._last_read_devices = last_read_devices
+        read_result = self.read_message(cancellation_token=cancellation_token,
+                                        timeout=timeout,
+                                        with_transaction=with_transaction)
+        if read_result is None:
+            return []
+
+        assert self._last_read_device is not None
+        last_read_devices.append(self._last_read_device)
+        read_results = [read_result]
+        if max_batch > 1:
+            self._collect_available(cancellation_token=cancellation_token,
+                                    read_results=read_results,
+                                    max_batch=max_batch,
+                                    with_transaction=with_transaction)
+        return read_results
+
+    def _collect_available(self,
+                           cancellation_token: threading.Event,
+                           read_results: List['ReadResult'],
+                           max_batch: int,
+                           with_transaction: bool):
+        """
+        reads the messages that are available on the inner devices (without waiting) into read_results,
+        until max_batch is reached, or a whole cycle over the devices returned nothing.
+        in round-robin mode, the devices are read one message at a time in turn.
+        in priority mode, each device is read until it is empty, before moving to the next one.
+        if an inner device fails, the messages that were already read are kept
+        (the error is raised when the device is read again)
+        """
+        is_cancelled = cancellation_token.is_set
+        inner_devices = self._inner_devices
+        device_count = len(inner_devices)
+        round_robin = self._round_robin
+        last_read_devices = self._last_read_devices
+        device_index = self._next_device_index
+        empty_count = 0
+        while len(read_results) < max_batch and empty_count < device_count and not is_cancelled():
+            inner_device = inner_devices[device_index]
+            try:
+                read_result = inner_device.read_message(cancellation_token=cancellation_token,
+                                                        timeout=0,
+                                                        with_transaction=with_transaction)
+            except Exception:
+                self._logger.warning(f'Error reading from device {inner_device.name}. '
+                                     f'returning the messages already read', exc_info=True)
+                if round_robin:
+                    device_index = (device_index + 1) % device_count
+                break
+            if read_result is None:
+                empty_count += 1
+                device_index = (device_index + 1) % device_count
+                continue
+
+            read_results.append(read_result)
+            last_read_devices.append(inner_device)
+            if round_robin:
+                empty_count = 0
+                device_index = (device_index + 1) % device_count
+
+        if round_robin:
+            self._next_device_index = device_index
+        self._last_read_device = last_read_devices[-1]
+
     def _read_message(self,
                       cancellation_token: threading.Event,
                       timeout: Optional[float] = None,
@@ -154,36 +412,154 @@ class AggregatedInputDevice(InputDevice[TManagerType]):
         the device headers, can contain extra information about the device that returned the message
         """
 
-        end_time = 0.0
-        if timeout is not None:
-            end_time = perf_counter() + timeout
+        if timeout is None:
+            return self._read_untimed(cancellation_token=cancellation_token,
+                                      with_transaction=with_transaction)
+
+        return self._read_timed(cancellation_token=cancellation_token,
+                                end_time=perf_counter() + timeout,
+                                with_transaction=with_transaction)
 
+    def _read_untimed(self,
+                      cancellation_token: threading.Event,
+                      with_transaction: bool) -> Optional['ReadResult']:
+        """
+        reads a message from the inner devices, waiting until a message is available (or cancellation was requested)
+        """
+        read_single_pass = self._read_single_pass
+        wait_between_passes = self._wait_between_passes
+        is_cancelled = cancellation_token.is_set
+        sleep_time = self._SLEEP_BETWEEN_ITERATIONS
         while True:
-            for inner_device in self._inner_devices_iterator:
-                self._last_read_device = inner_device
+            read_result = read_single_pass(cancellation_token=cancellation_token,
+                                           with_transaction=with_transaction)
+            if read_result is not None:
+                self._idle_sleep_time = self._MIN_SLEEP_BETWEEN_ITERATIONS
+                return read_result
+
+            if is_cancelled():
+                self._last_read_device = None
+                return None
+
+            wait_between_passes(cancellation_token, sleep_time)
+
+    def _read_timed(self,
+                    cancellation_token: threading.Event,
+                    end_time: float,
+                    with_transaction: bool) -> Optional['ReadResult']:
+        """
+        reads a message from the inner devices, waiting until a message is available or end_time has passed
+        (or cancellation was requested). all the devices are checked at least once, even if end_time has already passed
+        """
+        read_single_pass = self._read_single_pass
+        wait_between_passes = self._wait_between_passes
+        is_cancelled = cancellation_token.is_set
+        sleep_time = self._SLEEP_BETWEEN_ITERATIONS
+        while True:
+            read_result = read_single_pass(cancellation_token=cancellation_token,
+                                           with_transaction=with_transaction)
+            if read_result is not None:
+                self._idle_sleep_time = self._MIN_SLEEP_BETWEEN_ITERATIONS
+                return read_result
+
+            remaining_time = end_time - perf_counter()
+            if remaining_time <= 0 or is_cancelled():
+                self._last_read_device = None
+                return None
+
+            wait_between_passes(cancellation_token, sleep_time if sleep_time < remaining_time else remaining_time)
+
+    def _read_single_pass(self,
+                          cancellation_token: threading.Event,
+                          with_transaction: bool) -> Optional['ReadResult']:
+        """
+        tries to read a message from each of the inner devices (without waiting), and returns the first one found.
+        the pass stops as soon as cancellation is requested
+
+        :return: the ReadResult from the first device that had a message, or None if all the devices were empty
+        """
+        is_cancelled = cancellation_token.is_set
+        if is_cancelled():
+            return None
+
+        inner_devices = self._inner_devices
+        device_count = len(inner_devices)
+        start_index = self._next_device_index
+        for offset in range(device_count):
+            device_index = (start_index + offset) % device_count
+            inner_device = inner_devices[device_index]
+            try:
                 read_result = inner_device.read_message(cancellation_token=cancellation_token,
                                                         timeout=0,
                                                         with_transaction=with_transaction)
-                if read_result is not None:
-                    return read_result
+            except Exception:
+                self._last_read_device = inner_device
+                if self._round_robin:
+                    # the next read starts at the next device, so a failing device doesn't block the others
+                    self._next_device_index = (device_index + 1) % device_count
+                raise
+            if read_result is not None:
+                self._last_read_device = inner_device  # only written when a device is found
+                if self._round_robin:
+                    self._next_device_index = (device_index + 1) % device_count
+                return read_result
+
+            if is_cancelled():
+                break
 
-                if timeout is not None and perf_counter() >= end_time:
-                    break
+        return None
 
-            if timeout is not None and perf_counter() >= end_time:
-                self._last_read_device = None
-                return None
-            else:
-                # if all the devices were empty, wait before performing another iteration.
-                cancellation_token.wait(self._SLEEP_BETWEEN_ITERATIONS)
+    def _read_single_device(self,
+                            cancellation_token: threading.Event,
+                            with_transaction: bool) -> Optional['ReadResult']:
+        """
+        a specialization of '_read_single_pass' for aggregates with a single inner device.
+        skips the round-robin bookkeeping, and reads directly from the device
+        """
+        if cancellation_token.is_set():
+            return None
+
+        inner_device = self._inner_devices[0]
+        self._last_read_device = inner_device
+        return inner_device.read_message(cancellation_token=cancellation_token,
+                                         timeout=0,
+                                         with_transaction=with_transaction)
+
+    def _wait_between_passes(self, cancellation_token: threading.Event, max_sleep_time: float):
+        """
+        waits after a pass where all the devices were empty.
+        if all the devices have file descriptors, the wait ends as soon as one of them becomes readable.
+        if some of the devices support ready notifications, the wait ends as soon as one of them signals.
+        devices that don't support notifications are polled again after an exponentially growing sleep time
+        (up to max_sleep_time)
+        """
+        if self._epoll is not None:
+            # bounding maxevents keeps the events buffer at the size of the devices (the default is ~1k entries)
+            self._epoll.poll(max_sleep_time, self._epoll_max_events)
+            return
+
+        sleep_time = self._idle_sleep_time
+        if sleep_time < self._SLEEP_BETWEEN_ITERATIONS:
+            self._idle_sleep_time = min(sleep_time * 2, self._SLEEP_BETWEEN_ITERATIONS)
+        if sleep_time > max_sleep_time:
+            sleep_time = max_sleep_time
+
+        if self._has_ready_notifications:
+            self._ready.wait(sleep_time)
+            self._ready.clear()
+        else:
+            cancellation_token.wait(sleep_time)
 
     def close(self):
         """
         tries to close underlying devices
         """
         super().close()
-        for inner_device in self._inner_devices_iterator:
+        if self._epoll is not None:
+            self._epoll.close()
+        for inner_device in self._inner_devices:
             try:
+                inner_device.unregister_ready_callback(self._on_device_ready)
                 inner_device.close()
             except Exception:
                 self._logger.exception("Error closing underlying device")
@@ -197,6 +573,8 @@ class InputDeviceManager(Generic[TInputDeviceType], metaclass=ABCMeta):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._input_device_cache: Dict[str, TInputDeviceType] = {}
+        # taken only when a device is created, so that concurrent callers don't create the same device twice
+        self._input_device_cache_lock = threading.RLock()
 
     def __enter__(self):
         self.connect()
@@ -224,11 +602,21 @@ class InputDeviceManager(Generic[TInputDeviceType], metaclass=ABCMeta):
         :param name: the name of the input device to return
         :return: the input device
         """
-        input_device = self._input_device_cache.get(name, None)
-        if input_device is None:
-            input_device = self._create_input_device(name)
-            self._input_device_cache[name] = input_device
-
+        try:
+            return self._input_device_cache[name]  # the common case is a cache hit
+        except KeyError:
+            pass
+
+        # the cached names are interned, so that lookups with the same (interned) name compare by identity
+        # (only exact str names can be interned. str subclasses, like str enums, are cached as is)
+        if type(name) is str:
+            name = sys.intern(name)
+        with self._input_device_cache_lock:
+            if name in self._input_device_cache:  # created by another thread while we waited for the lock
+                input_device = self._input_device_cache[name]
+            else:
+                input_device = self._create_input_device(name)
+                self._input_device_cache[name] = input_device
         return input_device
 
     def delete_input_device_from_cache(self, name: str) -> bool:
@@ -251,18 +639,20 @@ class InputDeviceManager(Generic[TInputDeviceType], metaclass=ABCMeta):
         """
         pass
 
-    def get_aggregate_device(self, names: List[str]) -> AggregatedInputDevice:
+    def get_aggregate_device(self, names: List[str], priorities: Optional[List[int]] = None) -> AggregatedInputDevice:
         """
         creates an aggregated input device on all the devices with given names
 
         :param names: the names of the devices to create and aggregate
+        :param priorities: optional priorities for the devices (higher value is read first).
+        None means that the devices are read in round-robin order
         :return: the AggregatedInputDevice
         """
         inner_devices: List[InputDevice] = []
         for name in names:
             inner_devices.append(self.get_input_device(name))
 
-        return AggregatedInputDevice(manager=self, inner_devices=inner_devices)
+        return AggregatedInputDevice(manager=self, inner_devices=inner_devices, priorities=priorities)
 
 
 class _NullInputDeviceManager(InputDeviceManager):
@@ -280,13 +670,22 @@ class _NullInputDeviceManager(InputDeviceManager):
         return _NullDevice()
 
 
+_NULL_INPUT_DEVICE_MANAGER = _NullInputDeviceManager()
+
+
 class _NullDevice(InputDevice):
     """
-    this is a stub for creating a null transaction
+    this is a stub for creating a null transaction. it is a singleton (with a shared null device manager)
     """
+    _instance: Optional['_NullDevice'] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
 
     def __init__(self):
-        super().__init__(manager=_NullInputDeviceManager(),
+        super().__init__(manager=_NULL_INPUT_DEVICE_MANAGER,
                          name='__NULL__')
 
     def _read_message(self,
@@ -317,9 +716,9 @@ class ReadResult(MessageBundle):
         :param device_headers: Additional Headers that may return data from device, or affect its operation.
         :param transaction: the transaction returned by the reading device
         """
-        super().__init__(message=message,
-                         device_headers=device_headers)
-
+        # the slots are set directly, instead of calling MessageBundle.__init__ (a read result is created per message)
+        self._message = message
+        self._device_headers = device_headers if device_headers is not None else {}
         self._transaction = transaction
 
     @property
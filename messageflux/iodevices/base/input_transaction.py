@@ -1,14 +1,17 @@
 import threading
 from abc import ABCMeta, abstractmethod
+from collections import deque
 from enum import Enum, unique
-from threading import Event
-from typing import Optional, List, TYPE_CHECKING
+from threading import Condition, Lock
+from typing import Optional, List, Dict, Deque, Iterable, TYPE_CHECKING
 
 from messageflux.utils import KwargsException
 
 if TYPE_CHECKING:
     from messageflux.iodevices.base.input_devices import InputDevice, ReadResult
 
+_FINISH_CONDITION_CREATION_LOCK = Lock()
+
 
 class WrongTransactionStateException(KwargsException):
     """
@@ -40,13 +43,15 @@ class InputTransaction(metaclass=ABCMeta):
     if using the transaction as context (i.e 'with transaction:') it will commit at the end of the context.
     if an exception was raised during the context, the transaction will be rolled back.
     """
+    __slots__ = '_device', '_finished', '_finish_condition', '_state'
 
     def __init__(self, device: 'InputDevice'):
         """
         :param device: the input device that returned that transaction
         """
         self._device: 'InputDevice' = device
-        self._finished: Event = Event()
+        self._finished: bool = False
+        self._finish_condition: Optional[Condition] = None  # created on the first call to wait_for_finish
         self._state: TransactionState = TransactionState.ACTIVE
 
     @property
@@ -68,7 +73,7 @@ class InputTransaction(metaclass=ABCMeta):
         """
         :return: 'True' if the transaction was committed/rolled-back, 'False' otherwise
         """
-        return self._finished.is_set()
+        return self._finished
 
     def __enter__(self):
         if self.finished:
@@ -92,7 +97,16 @@ class InputTransaction(metaclass=ABCMeta):
 
         :return: the value of finished
         """
-        return self._finished.wait(timeout=timeout)
+        if self._finished:
+            return True
+
+        if self._finish_condition is None:
+            with _FINISH_CONDITION_CREATION_LOCK:
+                if self._finish_condition is None:
+                    self._finish_condition = Condition()
+
+        with self._finish_condition:
+            return self._finish_condition.wait_for(lambda: self._finished, timeout=timeout)
 
     def commit(self):
         """
@@ -104,8 +118,7 @@ class InputTransaction(metaclass=ABCMeta):
             return
 
         self._commit()
-        self._state = TransactionState.COMMITTED
-        self._finished.set()
+        self._set_finished(TransactionState.COMMITTED)
 
     def rollback(self):
         """
@@ -117,8 +130,21 @@ class InputTransaction(metaclass=ABCMeta):
             return
 
         self._rollback()
-        self._state = TransactionState.ROLLEDBACK
-        self._finished.set()
+        self._set_finished(TransactionState.ROLLEDBACK)
+
+    def _set_finished(self, state: TransactionState):
+        """
+        marks the transaction as finished with the given state, without calling _commit/_rollback.
+        this is used by devices that commit/rollback several transactions at once
+
+        :param state: the final state of the transaction (COMMITTED/ROLLEDBACK)
+        """
+        self._state = state
+        self._finished = True
+        finish_condition = self._finish_condition
+        if finish_condition is not None:
+            with finish_condition:
+                finish_condition.notify_all()
 
     @abstractmethod
     def _commit(self):
@@ -139,6 +165,7 @@ class InputTransactionScope(InputTransaction):
     """
     a helper class for reading several messages inside a transaction scope.
     """
+    __slots__ = '_with_transaction', '_transactions'
 
     def __init__(self, device: 'InputDevice', with_transaction: bool = True):
         """
@@ -147,7 +174,7 @@ class InputTransactionScope(InputTransaction):
         """
         super().__init__(device)
         self._with_transaction = with_transaction
-        self._transactions: List[InputTransaction] = []
+        self._transactions: Deque[InputTransaction] = deque()
 
     def read_message(self,
                      cancellation_token: threading.Event,
@@ -175,29 +202,97 @@ class InputTransactionScope(InputTransaction):
 
         return read_result
 
+    def read_messages(self,
+                      cancellation_token: threading.Event,
+                      timeout: Optional[float] = None,
+                      max_batch: int = 1) -> List['ReadResult']:
+        """
+        this method returns up to max_batch messages from the device, and adds their transactions to the scope
+
+        :param cancellation_token: the cancellation token for this service. this can be used to know if cancellation
+        was requested
+
+        :param timeout: an optional timeout (in seconds) to wait for the first message (None means block until
+        a message is available). if the device doesn't have a message to return after timeout seconds,
+        it will return an empty list
+        :param max_batch: the maximum number of messages to return
+
+        :return: a list of ReadResult objects (empty if no message was available)
+        """
+        read_results = self.device.read_messages(cancellation_token=cancellation_token,
+                                                 timeout=timeout,
+                                                 max_batch=max_batch,
+                                                 with_transaction=self._with_transaction)
+        self._transactions.extend(read_result.transaction for read_result in read_results)
+
+        return read_results
+
+    @staticmethod
+    def _get_unfinished_transactions_by_device(
+            transactions: Iterable[InputTransaction]) -> Dict['InputDevice', List[InputTransaction]]:
+        """
+        groups the unfinished transactions by the device that returned them, keeping their order
+        (this allows someone to commit/rollback individual transactions within the scope)
+        """
+        transactions_by_device: Dict['InputDevice', List[InputTransaction]] = {}
+        for transaction in transactions:
+            if not transaction.finished:
+                transactions_by_device.setdefault(transaction.device, []).append(transaction)
+        return transactions_by_device
+
     def _commit(self):
         """
-        commits all the transactions in scope
+        commits all the transactions in scope (in a single batch per device), in the order they were read
         """
-        for transaction in self._transactions:
-            if not transaction.finished:  # allows someone to rollback individual transactions within committed scope
-                transaction.commit()
+        transactions_by_device = self._get_unfinished_transactions_by_device(self._transactions)
+        for device, transactions in transactions_by_device.items():
+            device.commit_batch(transactions)
         self._transactions.clear()
 
     def _rollback(self):
         """
-        rolls back all the transaction in scope
+        rolls back all the transaction in scope (in a single batch per device), newest first.
+        this releases the most recently read messages first, which some brokers handle more efficiently
         """
-        for transaction in self._transactions:
-            if not transaction.finished:  # allows someone to commit individual transactions within rolled back scope
-                transaction.rollback()
+        transactions_by_device = self._get_unfinished_transactions_by_device(reversed(self._transactions))
+        for device, transactions in transactions_by_device.items():
+            device.rollback_batch(transactions)
         self._transactions.clear()
 
 
 class NULLTransaction(InputTransaction):
     """
     a transaction object that does nothing. used as placeholder for reading with with_transaction=False
+
+    the transaction is always finished (committed), and commit/rollback do nothing
     """
+    __slots__ = ()
+
+    def __init__(self, device: 'InputDevice'):
+        """
+        :param device: the input device that returned that transaction
+        """
+        super().__init__(device)
+        self._finished = True
+        self._state = TransactionState.COMMITTED
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def commit(self):
+        """
+        does nothing
+        """
+        pass
+
+    def rollback(self):
+        """
+        does nothing
+        """
+        pass
 
     def _commit(self):
         pass
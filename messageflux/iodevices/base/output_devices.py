@@ -1,5 +1,7 @@
+import sys
+import threading
 from abc import ABCMeta, abstractmethod
-from typing import Optional, TypeVar, Generic, Dict
+from typing import Optional, TypeVar, Generic, Dict, Tuple
 
 from messageflux.iodevices.base.common import Message, DeviceHeaders, MessageBundle
 from messageflux.utils import AggregatedException
@@ -57,8 +59,16 @@ class OutputDevice(Generic[TManagerType], metaclass=ABCMeta):
         :param device_headers: optional headers to send to underlying device.
         those headers are not part of the message, but contains extra data for the device, that can modify its operation
         """
-        device_headers = device_headers or {}
-        self._send_message(MessageBundle(message=message, device_headers=device_headers))
+        self._send_message(MessageBundle(message, device_headers))
+
+    def send_message_bundle(self, message_bundle: MessageBundle):
+        """
+        sends a message bundle to the device.
+        this is the same as send_message, but doesn't create a new bundle (used by devices that wrap other devices)
+
+        :param message_bundle: the message bundle to send
+        """
+        self._send_message(message_bundle)
 
     @abstractmethod
     def _send_message(self, message_bundle: MessageBundle):
@@ -84,6 +94,12 @@ class OutputDeviceManager(Generic[TOutputDeviceType], metaclass=ABCMeta):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._output_device_cache: Dict[str, TOutputDeviceType] = {}
+        # taken when a device is created (so that concurrent callers don't create the same device twice),
+        # deleted, or remembered as the last device
+        self._output_device_cache_lock = threading.RLock()
+        # the last device returned by get_output_device, with its name (kept in a single tuple, so that readers from
+        # other threads never see a name with the wrong device)
+        self._last_output_device: Optional[Tuple[str, TOutputDeviceType]] = None
 
     def __enter__(self):
         self.connect()
@@ -111,7 +127,9 @@ class OutputDeviceManager(Generic[TOutputDeviceType], metaclass=ABCMeta):
         :param name:the device to delete from cache
         :return: True if the device existed and deleted, False otherwise
         """
-        device = self._output_device_cache.pop(name, None)
+        with self._output_device_cache_lock:
+            device = self._output_device_cache.pop(name, None)
+            self._last_output_device = None
         return device is not None
 
     def get_output_device(self, name: str) -> TOutputDeviceType:
@@ -121,10 +139,31 @@ class OutputDeviceManager(Generic[TOutputDeviceType], metaclass=ABCMeta):
         :param name: the name of the output device to create
         :return: the created output device
         """
-        output_device = self._output_device_cache.get(name, None)
-        if output_device is None:
-            output_device = self._create_output_device(name)
-            self._output_device_cache[name] = output_device
+        last_output_device = self._last_output_device
+        if last_output_device is not None and last_output_device[0] is name:
+            return last_output_device[1]  # the same name object as the last call (i.e a constant name)
+
+        try:
+            output_device = self._output_device_cache[name]  # the common case is a cache hit
+        except KeyError:
+            # the cached names are interned, so that lookups with the same (interned) name compare by identity
+            # (only exact str names can be interned. str subclasses, like str enums, are cached as is)
+            if type(name) is str:
+                name = sys.intern(name)
+            with self._output_device_cache_lock:
+                if name in self._output_device_cache:  # created by another thread while we waited for the lock
+                    output_device = self._output_device_cache[name]
+                else:
+                    output_device = self._create_output_device(name)
+                    self._output_device_cache[name] = output_device
+                self._last_output_device = (name, output_device)
+        else:
+            self._last_output_device = (name, output_device)
+            # the slot is cleared if the device was deleted from the cache in the meantime (otherwise, a closed device
+            # would be returned for this name from now on). 'delete_output_device_from_cache' clears the slot after
+            # its pop, so either it clears our slot, or we see its pop here - no lock is needed on the hit path
+            if self._output_device_cache.get(name) is not output_device:
+                self._last_output_device = None
 
         return output_device
 
@@ -1,7 +1,7 @@
 import logging
 import threading
-from time import perf_counter
-from typing import Optional, Collection, List, Callable
+from time import perf_counter_ns
+from typing import Optional, Collection, List, Callable, Set
 
 from messageflux import InputDevice, ReadResult
 from messageflux.iodevices.base import InputDeviceManager, InputDeviceException
@@ -13,6 +13,8 @@ class CollectionInputDevice(InputDevice['CollectionInputDeviceManager']):
 
     it iterates over the collection, and returns the first successful item read from the device
     """
+    # the amount in seconds to sleep between iterations, if all the devices are empty
+    # (devices that support ready notifications wake the device before that)
     _SLEEP_BETWEEN_ITERATIONS: float = 0.1
 
     def __init__(self,
@@ -30,7 +32,17 @@ class CollectionInputDevice(InputDevice['CollectionInputDeviceManager']):
                          name=device_name)
 
         self._input_devices = input_devices
+        self._num_devices = len(input_devices)
         self._logger = logging.getLogger(__name__)
+        # the ids of the devices that failed on their last read. only their first failure is logged with a traceback
+        self._failing_devices: Set[int] = set()
+
+        self._ready = threading.Event()
+        self._on_device_ready = self._ready.set
+        self._has_ready_notifications = False
+        for input_device in input_devices:
+            if input_device.register_ready_callback(self._on_device_ready):
+                self._has_ready_notifications = True
 
     def _read_message(self,
                       cancellation_token: threading.Event,
@@ -51,36 +63,87 @@ class CollectionInputDevice(InputDevice['CollectionInputDeviceManager']):
         :return: a ReadResult object or None if no message was available.
         the device headers, can contain extra information about the device that returned the message
         """
-        end_time = 0.0
+        # the deadline is kept in integer nanoseconds, so that the remaining time doesn't accumulate rounding errors
+        end_time_ns = 0
         if timeout is not None:
-            end_time = perf_counter() + timeout
-
+            end_time_ns = perf_counter_ns() + int(timeout * 1e9)
+
+        # the devices are all checked on every iteration (the deadline is checked only between iterations)
+        input_devices = self._input_devices
+        num_devices = self._num_devices
+        logger = self._logger
+        failing_devices = self._failing_devices
+        wait_for_devices = self._wait_for_devices
+        sleep_between_iterations = self._SLEEP_BETWEEN_ITERATIONS
         while True:
-            failures = []
-            for curr_device in self._input_devices:
+            failures: Optional[List[Exception]] = None  # allocated only on failure (not on the common path)
+            for curr_device in input_devices:
                 try:
                     read_result = curr_device._read_message(cancellation_token=cancellation_token,
                                                             timeout=0,
                                                             with_transaction=with_transaction)
+                    if failing_devices:
+                        failing_devices.discard(id(curr_device))
                     if read_result is not None:
                         return read_result
-                    if timeout is not None and perf_counter() >= end_time:
-                        break
                 except Exception as ex:
+                    if failures is None:
+                        failures = []
                     failures.append(ex)
-                    self._logger.warning(f"Error reading from {curr_device.name} device", exc_info=True)
-                    if timeout is not None and perf_counter() >= end_time:
-                        break
-
-            if len(failures) >= len(self._input_devices):
-                self._logger.error('Error reading from CollectionInputDevice - all devices failed')
+                    if id(curr_device) not in failing_devices:
+                        failing_devices.add(id(curr_device))
+                        logger.warning(f"Error reading from {curr_device.name} device", exc_info=True)
+                    elif logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Error reading from {curr_device.name} device (still failing): {ex!r}")
+
+            if failures is not None and len(failures) >= num_devices:
+                logger.error('Error reading from CollectionInputDevice - all devices failed')
                 raise InputDeviceException('Error reading from CollectionInputDevice - all devices failed',
                                            inner_exceptions=failures)
 
-            if timeout is not None and perf_counter() >= end_time:
+            if cancellation_token.is_set():
                 return None
-            else:
-                cancellation_token.wait(self._SLEEP_BETWEEN_ITERATIONS)
+
+            sleep_time = sleep_between_iterations
+            if timeout is not None:
+                remaining_time_ns = end_time_ns - perf_counter_ns()
+                if remaining_time_ns <= 0:
+                    return None
+                if remaining_time_ns < sleep_time * 1e9:
+                    sleep_time = remaining_time_ns / 1e9
+
+            wait_for_devices(cancellation_token, sleep_time)
+
+    def _wait_for_devices(self, cancellation_token: threading.Event, sleep_time: float):
+        """
+        waits after an iteration where all the devices were empty.
+        if some of the devices support ready notifications, the wait ends as soon as one of them signals.
+        devices that don't support notifications are polled again after sleep_time
+        """
+        if self._has_ready_notifications:
+            self._ready.wait(sleep_time)
+            self._ready.clear()
+        else:
+            cancellation_token.wait(sleep_time)
+
+    def register_ready_callback(self, callback: Callable[[], None]) -> bool:
+        """
+        registers the ready callback on all the underlying devices
+
+        :return: True if any of the underlying devices supports ready notifications
+        """
+        supported = False
+        for device in self._input_devices:
+            if device.register_ready_callback(callback):
+                supported = True
+        return supported
+
+    def unregister_ready_callback(self, callback: Callable[[], None]) -> None:
+        """
+        unregisters the ready callback from all the underlying devices
+        """
+        for device in self._input_devices:
+            device.unregister_ready_callback(callback)
 
     def close(self):
         """
@@ -89,6 +152,7 @@ class CollectionInputDevice(InputDevice['CollectionInputDeviceManager']):
         super().close()
         for device in self._input_devices:
             try:
+                device.unregister_ready_callback(self._on_device_ready)
                 device.close()
             except Exception:
                 self._logger.warning(f'Error closing underlying device {device.name}', exc_info=True)
@@ -118,6 +182,9 @@ class CollectionInputDeviceManager(InputDeviceManager[CollectionInputDevice]):
         """
         connects to device manager
         """
+        # the managers are connected one after the other, on the calling thread.
+        # some managers keep thread local connections (e.g. RabbitMQ), so connecting them from a thread pool
+        # would leave the calling thread without a connection
         failures = []
         for manager in self._inner_managers:
             try:
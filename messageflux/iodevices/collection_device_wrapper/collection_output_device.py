@@ -1,5 +1,6 @@
 import logging
-from typing import Collection, List, Callable
+from time import monotonic
+from typing import Collection, List, Callable, Optional, Dict
 
 from messageflux.iodevices.base import OutputDeviceManager, OutputDevice, OutputDeviceException
 from messageflux.iodevices.base.common import MessageBundle
@@ -9,8 +10,15 @@ class CollectionOutputDevice(OutputDevice['CollectionOutputDeviceManager']):
     """
     this class writes to a collection of output devices.
 
-    it iterates over the collection, and sends to the first successful device
+    it iterates over the collection, and sends to the first successful device.
+
+    a device that fails several times in a row is skipped for a while (and then tried again),
+    so that every send doesn't wait for it to fail. it is still tried if all the other devices fail
     """
+    # the number of consecutive failures, after which a device is skipped
+    _MAX_CONSECUTIVE_FAILURES: int = 10
+    # the time (in seconds) to skip a failing device, before trying it again
+    _DEVICE_BYPASS_INTERVAL: float = 5
 
     def __init__(self,
                  device_manager: 'CollectionOutputDeviceManager',
@@ -26,6 +34,11 @@ class CollectionOutputDevice(OutputDevice['CollectionOutputDeviceManager']):
         self._output_devices = output_devices
 
         self._logger = logging.getLogger(__name__)
+        # the number of consecutive failures for each failing device (by id).
+        # only the first failure of a device is logged with a traceback
+        self._failure_counts: Dict[int, int] = {}
+        # the time (monotonic) until which each skipped device (by id) is skipped
+        self._bypassed_until: Dict[int, float] = {}
 
     def _send_message(self, message_bundle: MessageBundle):
         """
@@ -33,18 +46,70 @@ class CollectionOutputDevice(OutputDevice['CollectionOutputDeviceManager']):
 
         :param message_bundle: the message bundle to send
         """
-        failures = []
+        bypassed_until = self._bypassed_until
+        failures: Optional[List[Exception]] = None  # allocated only on failure (not on the common path)
+        skipped_devices: Optional[List[OutputDevice]] = None  # allocated only when some devices are skipped
         for curr_device in self._output_devices:
-            try:
-                curr_device.send_message(message_bundle.message, message_bundle.device_headers)
+            if bypassed_until:
+                device_bypassed_until = bypassed_until.get(id(curr_device))
+                if device_bypassed_until is not None:
+                    if monotonic() < device_bypassed_until:
+                        if skipped_devices is None:
+                            skipped_devices = []
+                        skipped_devices.append(curr_device)
+                        continue
+                    del bypassed_until[id(curr_device)]  # try the device again
+            error = self._try_send(curr_device, message_bundle)
+            if error is None:
                 return
-            except Exception as e:
-                failures.append(e)
-                self._logger.warning(f'underlying device {curr_device.name}', exc_info=True)
+            if failures is None:
+                failures = []
+            failures.append(error)
+
+        if skipped_devices is not None:
+            # all the other devices failed. the skipped devices are the last resort
+            for curr_device in skipped_devices:
+                error = self._try_send(curr_device, message_bundle)
+                if error is None:
+                    return
+                if failures is None:
+                    failures = []
+                failures.append(error)
 
         self._logger.error("Couldn't send to any underlying device")
         raise OutputDeviceException("Couldn't send to any underlying device", inner_exceptions=failures)
 
+    def _try_send(self, device: OutputDevice, message_bundle: MessageBundle) -> Optional[Exception]:
+        """
+        sends the message to a single underlying device, and keeps track of its failures
+
+        :param device: the underlying device to send to
+        :param message_bundle: the message bundle to send
+        :return: None if the message was sent, or the exception that the device raised
+        """
+        failure_counts = self._failure_counts
+        try:
+            device.send_message_bundle(message_bundle)
+        except Exception as e:
+            failure_count = failure_counts.get(id(device), 0) + 1
+            if failure_count == 1:
+                self._logger.warning(f'underlying device {device.name}', exc_info=True)
+            elif self._logger.isEnabledFor(logging.DEBUG):
+                self._logger.debug(f'underlying device {device.name} (still failing): {e!r}')
+
+            if failure_count >= self._MAX_CONSECUTIVE_FAILURES:
+                failure_count = 0
+                self._bypassed_until[id(device)] = monotonic() + self._DEVICE_BYPASS_INTERVAL
+                self._logger.warning(f'underlying device {device.name} failed {self._MAX_CONSECUTIVE_FAILURES} '
+                                     f'times in a row. skipping it for {self._DEVICE_BYPASS_INTERVAL} seconds')
+            failure_counts[id(device)] = failure_count
+            return e
+
+        if failure_counts:
+            failure_counts.pop(id(device), None)
+            self._bypassed_until.pop(id(device), None)
+        return None
+
     def close(self):
         """
         closes the connection to device
@@ -81,6 +146,9 @@ class CollectionOutputDeviceManager(OutputDeviceManager[CollectionOutputDevice])
         """
         connects to device manager
         """
+        # the managers are connected one after the other, on the calling thread.
+        # some managers keep thread local connections (e.g. RabbitMQ), so connecting them from a thread pool
+        # would leave the calling thread without a connection
         failures = []
         for manager in self._inner_managers:
             try:
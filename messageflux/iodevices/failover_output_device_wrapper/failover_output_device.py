@@ -1,4 +1,5 @@
 import logging
+from time import monotonic
 from typing import Optional
 
 from messageflux.iodevices.base import OutputDevice, OutputDeviceException, OutputDeviceManager
@@ -8,7 +9,14 @@ from messageflux.iodevices.base.common import MessageBundle
 class FailoverOutputDevice(OutputDevice['FailoverOutputDeviceManager']):
     """
     this device tries to send to primary output device - if the primary fails, it sends to secondary
+
+    if the primary fails several times in a row, the messages are sent directly to the secondary for a while,
+    without trying the primary first (so that every send doesn't wait for the primary to fail)
     """
+    # the number of consecutive primary failures, after which the primary is bypassed
+    _MAX_CONSECUTIVE_PRIMARY_FAILURES: int = 10
+    # the time (in seconds) to bypass the primary, before trying it again
+    _PRIMARY_BYPASS_INTERVAL: float = 5
 
     def __init__(self,
                  device_manager: 'FailoverOutputDeviceManager',
@@ -30,6 +38,8 @@ class FailoverOutputDevice(OutputDevice['FailoverOutputDeviceManager']):
         self._inner_device = inner_device
         self._failover_device = failover_device
         self._logger = logging.getLogger(__name__)
+        self._consecutive_primary_failures = 0
+        self._bypass_primary_until = 0.0
 
     @property
     def inner_device(self) -> OutputDevice:
@@ -75,15 +85,40 @@ class FailoverOutputDevice(OutputDevice['FailoverOutputDeviceManager']):
 
         :param stream: the stream to send
         """
+        if self._bypass_primary_until:
+            if monotonic() < self._bypass_primary_until:
+                try:
+                    self._failover_device.send_message_bundle(message_bundle)
+                    return
+                except Exception as ex:
+                    raise OutputDeviceException("Couldn't send to failover device (the primary device is bypassed)",
+                                                inner_exceptions=[ex])
+            self._bypass_primary_until = 0.0  # try the primary again
+
         failures = []
         try:
-            self._inner_device.send_message(message_bundle.message, message_bundle.device_headers)
+            self._inner_device.send_message_bundle(message_bundle)
+            if self._consecutive_primary_failures:
+                self._consecutive_primary_failures = 0
             return
         except Exception as ex:
             failures.append(ex)
-            self._logger.warning(f'Error sending to underlying device {self._inner_device.name}', exc_info=True)
+            if not self._consecutive_primary_failures:  # only the first failure in a row is logged with a traceback
+                self._logger.warning(f'Error sending to underlying device {self._inner_device.name}', exc_info=True)
+            elif self._logger.isEnabledFor(logging.DEBUG):
+                self._logger.debug(f'Error sending to underlying device {self._inner_device.name} '
+                                   f'(still failing): {ex!r}')
+            self._consecutive_primary_failures += 1
+            if self._consecutive_primary_failures >= self._MAX_CONSECUTIVE_PRIMARY_FAILURES:
+                self._consecutive_primary_failures = 0
+                self._bypass_primary_until = monotonic() + self._PRIMARY_BYPASS_INTERVAL
+                self._logger.warning(f'underlying device {self._inner_device.name} failed '
+                                     f'{self._MAX_CONSECUTIVE_PRIMARY_FAILURES} times in a row. '
+                                     f'sending to the failover device for {self._PRIMARY_BYPASS_INTERVAL} seconds')
 
             try:
+                # the copy rewinds the stream (the primary may have moved it), and copies the headers
+                # (some output devices add headers to the message they send)
                 self._failover_device.send_message(message_bundle.message.copy(), message_bundle.device_headers)
                 return
             except Exception as ex:
@@ -1,5 +1,6 @@
 import os
 import socket
+import sys
 from os import scandir
 from typing import List, Optional
 
@@ -22,6 +23,7 @@ class FileSystemDeviceManagerBase:
                  tmp_dir_name: str = DEFAULT_TMPDIR_SUB_DIR,
                  bookkeeping_dir_name: str = DEFAULT_BOOKKEEPING_SUB_DIR,
                  serializer: Optional[FileSystemSerializerBase] = None,
+                 queue_names_are_dirs: bool = False,
                  **kwargs):
         """
         :param root_folder: the root folder to use for the manager
@@ -29,6 +31,9 @@ class FileSystemDeviceManagerBase:
         :param tmp_dir_name: the name of the subdirectory under root_folder to use for temp files
         :param bookkeeping_dir_name: the name of the subdirectory under root_folder that holds the book-keeping data
         :param serializer: the serializer to use to write messages to files. None will use the default serializer
+        :param queue_names_are_dirs: True if the queues folder contains only queue directories.
+        in that case, get_available_device_names doesn't check the type of the entries (which may require a stat call
+        for each entry, on some network file systems)
         """
         super().__init__(**kwargs)
 
@@ -36,14 +41,18 @@ class FileSystemDeviceManagerBase:
         self._queues_folder = os.path.join(root_folder, queue_dir_name)
         self._tmp_folder = os.path.join(root_folder, tmp_dir_name)
         self._bookkeeping_folder = os.path.join(root_folder, bookkeeping_dir_name)
-        self._unique_manager_id = f'{socket.gethostname()}-{get_random_id()}'
+        self._unique_manager_id: Optional[str] = None  # created on first use (not all the managers need it)
         self._serializer = serializer or DefaultFileSystemSerializer()
+        self._directories_created = False
+        self._queue_names_are_dirs = queue_names_are_dirs
 
     @property
     def unique_manager_id(self) -> str:
         """
         this is a unique id for this manager instance
         """
+        if self._unique_manager_id is None:
+            self._unique_manager_id = f'{socket.gethostname()}-{get_random_id()}'
         return self._unique_manager_id
 
     @property
@@ -71,19 +80,27 @@ class FileSystemDeviceManagerBase:
         """
         returns a list of available 'queues' in the queue folder
         """
-        available_devices = []
-        for dir_entry in scandir(self._queues_folder):
-            if dir_entry.is_dir():
-                available_devices.append(dir_entry.name)
-        return available_devices
+        if self._queue_names_are_dirs:
+            return [sys.intern(name) for name in os.listdir(self._queues_folder)]
+
+        # is_dir() uses the file type returned by scandir, and only calls stat for symbolic links.
+        # the names are interned, since they are usually used as device names (i.e cache keys)
+        with scandir(self._queues_folder) as dir_entries:
+            return [sys.intern(dir_entry.name) for dir_entry in dir_entries if dir_entry.is_dir()]
 
     def _create_all_directories(self):
         """
-        connects to device manager
+        creates the manager directories (only on the first call. repeated connects don't touch the file system)
         """
-        try:
-            os.makedirs(self._tmp_folder, exist_ok=True)
-            os.makedirs(self._queues_folder, exist_ok=True)
-            os.makedirs(self._bookkeeping_folder, exist_ok=True)
-        except Exception as e:
-            raise KwargsException('Error creating directories') from e
+        if self._directories_created:
+            return
+
+        for folder in (self._tmp_folder, self._queues_folder, self._bookkeeping_folder):
+            if os.path.isdir(folder):  # the common case. a single stat, instead of walking the path in makedirs
+                continue
+            try:
+                os.makedirs(folder, exist_ok=True)
+            except Exception as e:
+                raise KwargsException(f'Error creating directory {folder}') from e
+
+        self._directories_created = True
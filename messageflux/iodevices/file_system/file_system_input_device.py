@@ -1,30 +1,74 @@
-import json
 import logging
 import os
+import errno
+import heapq
 import random
+import stat
 import threading
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from io import BytesIO
 from random import randint
-from typing import Optional, Dict, List, Set, Iterator
+from typing import Optional, Dict, List, Set, Iterator, Tuple
 
 from messageflux.iodevices.base import InputTransaction, InputDeviceManager, InputDevice, ReadResult, \
     InputDeviceException
+from messageflux.iodevices.base.input_transaction import TransactionState
 from messageflux.iodevices.file_system.file_system_device_manager_base import FileSystemDeviceManagerBase
 from messageflux.iodevices.file_system.file_system_serializer import FileSystemSerializerBase, \
     DefaultFileSystemSerializer
 from messageflux.metadata_headers import MetadataHeaders
-from messageflux.utils import get_random_id
-from messageflux.utils.filesystem import atomic_move, AtomicMoveException
+from messageflux.utils import get_random_id, json_dumps_bytes, json_loads
+from messageflux.utils.filesystem import atomic_move, AtomicMoveException, DirectoryWatcher, fsync_dir, \
+    read_file_bytes
+
+_O_DIRECTORY = getattr(os, 'O_DIRECTORY', 0)
+
+
+class _PoisonCounts:
+    """
+    a thread safe counter of rollbacks per file, bounded in size (the least recently rolled back files are evicted)
+    """
+    _MAX_ENTRIES = 100000
+
+    def __init__(self):
+        self._counts: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def increment(self, path: str) -> int:
+        """
+        increments the rollback count of a file
+
+        :param path: the path of the file
+        :return: the new count
+        """
+        with self._lock:
+            count = self._counts.get(path, 0) + 1
+            self._counts[path] = count
+            self._counts.move_to_end(path)
+            if len(self._counts) > self._MAX_ENTRIES:
+                self._counts.popitem(last=False)
+            return count
+
+    def pop(self, path: str):
+        """
+        removes the rollback count of a file
+
+        :param path: the path of the file
+        """
+        with self._lock:
+            self._counts.pop(path, None)
 
 
 class FileSystemInputTransaction(InputTransaction):
     """
     represents an InputTransaction for filesystem
     """
+    __slots__ = '_org_path', '_tmp_path', '_device_manager'
 
     MAX_POISON_COUNT = 3  # TODO: get this from the user.
-    _POISON_COUNTS_PER_FILE: Dict[str, int] = defaultdict(lambda: 0)
+    _POISON_COUNTS_PER_FILE = _PoisonCounts()
+    _POISON_FOLDERS: Set[str] = set()  # the poison folders that were already created
     _logger = logging.getLogger(__name__)
 
     def __init__(self, device: 'FileSystemInputDevice', org_path: str, tmp_path: str):
@@ -64,7 +108,9 @@ class FileSystemInputTransaction(InputTransaction):
         basename = os.path.basename(org_filename)
         dirname = os.path.dirname(org_filename)
         poison_folder = os.path.join(dirname, 'POISON')  # TODO: get this from the user
-        os.makedirs(poison_folder, exist_ok=True)
+        if poison_folder not in FileSystemInputTransaction._POISON_FOLDERS:
+            os.makedirs(poison_folder, exist_ok=True)
+            FileSystemInputTransaction._POISON_FOLDERS.add(poison_folder)
         poison_filepath = os.path.join(poison_folder, get_random_id() + basename)
         return poison_filepath
 
@@ -84,7 +130,9 @@ class FileSystemInputTransaction(InputTransaction):
                   org_path: str,
                   tmp_folder: str,
                   with_transaction: bool,
-                  serializer: FileSystemSerializerBase) -> Optional[ReadResult]:
+                  serializer: FileSystemSerializerBase,
+                  same_file_system: bool = False,
+                  dir_fds: Optional[Tuple[int, int]] = None) -> Optional[ReadResult]:
         """
         reads the file from org_path, and adds the file to transaction if it exists, or delete if it doesn't
         :param device: the input device for this transaction
@@ -92,21 +140,27 @@ class FileSystemInputTransaction(InputTransaction):
         :param tmp_folder: the temporary folder to use while holding files in transaction
         :param with_transaction: if set to 'False' no transaction is made, and the message is acked on read
         :param serializer: the serializer to use to deserialize the file
+        :param same_file_system: True if org_path and tmp_folder are on the same file system.
+        in that case the file is moved with a single (atomic) rename, without a lockfile
+        :param dir_fds: optional file descriptors of the folder of org_path and of tmp_folder (on the same file system).
+        if given, the file is renamed relative to them, which saves the kernel the lookup of the full paths
         """
 
         tmp_path = os.path.join(tmp_folder, get_random_id())
         try:
-            if not atomic_move(org_path,
-                               tmp_path,
-                               FileSystemInputTransaction._calc_lockfile_name(tmp_folder,
-                                                                              org_path)):
+            if same_file_system:
+                if not FileSystemInputTransaction._rename_file(org_path, tmp_path, tmp_folder, dir_fds):
+                    return None
+            elif not atomic_move(org_path,
+                                 tmp_path,
+                                 FileSystemInputTransaction._calc_lockfile_name(tmp_folder,
+                                                                                org_path)):
                 return None
-        except AtomicMoveException:
+        except (AtomicMoveException, OSError):
             FileSystemInputTransaction._logger.exception(f'Atomic move could not move the file {org_path}')
             return None
 
-        with open(tmp_path, 'rb') as f:
-            message = serializer.deserialize(f)
+        message = serializer.deserialize(BytesIO(read_file_bytes(tmp_path)))
 
         if with_transaction:
             return ReadResult(message=message,
@@ -121,15 +175,53 @@ class FileSystemInputTransaction(InputTransaction):
 
             return ReadResult(message)
 
-    def _commit(self):
+    @staticmethod
+    def _rename_file(org_path: str,
+                     tmp_path: str,
+                     tmp_folder: str,
+                     dir_fds: Optional[Tuple[int, int]] = None) -> bool:
         """
-        commits the transaction
+        moves the file with rename, which is atomic on the same file system
+        (if several readers try to move the same file, only one of them succeeds)
+
+        :param org_path: the original path of the file
+        :param tmp_path: the temp path to move the file to
+        :param tmp_folder: the temp folder (used for the lockfile, if we fall back to atomic_move)
+        :param dir_fds: optional file descriptors of the folders of org_path and tmp_path, to rename relative to
+        :return: True if the file was moved, False if it doesn't exist anymore (i.e another reader took it)
+        """
+        if dir_fds is not None:
+            try:
+                os.rename(os.path.basename(org_path), os.path.basename(tmp_path),
+                          src_dir_fd=dir_fds[0], dst_dir_fd=dir_fds[1])
+                return True
+            except OSError:
+                pass  # another reader took the file, or the folders were replaced since they were opened
+        try:
+            os.rename(org_path, tmp_path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as ex:
+            if ex.errno != errno.EXDEV:  # i.e a bind mount of another file system
+                raise
+        return atomic_move(org_path, tmp_path, FileSystemInputTransaction._calc_lockfile_name(tmp_folder, org_path))
+
+    def _remove_tmp_file(self):
+        """
+        removes the file of a committed transaction
         """
         try:
             os.remove(self._tmp_path)
         except FileNotFoundError:
             pass
-        self._POISON_COUNTS_PER_FILE.pop(self._org_path, None)
+        self._POISON_COUNTS_PER_FILE.pop(self._org_path)
+
+    def _commit(self):
+        """
+        commits the transaction
+        """
+        self._remove_tmp_file()
         self._device_manager.transaction_log.remove_transaction(self)
 
     @staticmethod
@@ -141,14 +233,19 @@ class FileSystemInputTransaction(InputTransaction):
         :param org_path: the original path of the file
         :param max_poison_count: the maximum time we allow the file to be rolled back
         """
-        FileSystemInputTransaction._POISON_COUNTS_PER_FILE[org_path] += 1
-        if FileSystemInputTransaction._POISON_COUNTS_PER_FILE[org_path] >= max_poison_count:
+        if FileSystemInputTransaction._POISON_COUNTS_PER_FILE.increment(org_path) >= max_poison_count:
             dest = FileSystemInputTransaction._get_poison_filename(org_path)
-            FileSystemInputTransaction._POISON_COUNTS_PER_FILE.pop(org_path, None)
+            FileSystemInputTransaction._POISON_COUNTS_PER_FILE.pop(org_path)
         else:
             dest = org_path
 
-        atomic_move(tmp_path, dest, FileSystemInputTransaction._calc_lockfile_name(os.path.dirname(tmp_path), dest))
+        tmp_folder = os.path.dirname(tmp_path)
+        if not atomic_move(tmp_path, dest, FileSystemInputTransaction._calc_lockfile_name(tmp_folder, dest)) \
+                and dest != org_path and not os.path.isdir(os.path.dirname(dest)):
+            # the poison folder was removed since we created it. create it again
+            FileSystemInputTransaction._POISON_FOLDERS.discard(os.path.dirname(dest))
+            dest = FileSystemInputTransaction._get_poison_filename(org_path)
+            atomic_move(tmp_path, dest, FileSystemInputTransaction._calc_lockfile_name(tmp_folder, dest))
 
     def _rollback(self):
         """
@@ -159,13 +256,19 @@ class FileSystemInputTransaction(InputTransaction):
                                org_path=self._org_path,
                                max_poison_count=self.MAX_POISON_COUNT)
             self._device_manager.transaction_log.remove_transaction(self)
+            device = self.device
+            if isinstance(device, FileSystemInputDevice):
+                device._notify_rollback()
         except AtomicMoveException:
             self._logger.exception(f"Could not rollback file:{self._org_path}")
 
 
 class TransactionLog:
     """
-    this class is used to persist transaction log into filesystem, so it can be rolled back on process termination
+    this class is used to persist transaction log into filesystem, so it can be rolled back on process termination.
+
+    adding and removing transactions only marks the log as changed. the file is written by the manager's
+    transaction log thread, which wakes up on changes (so that many changes are coalesced into a single write)
     """
     _logger = logging.getLogger(__name__)
 
@@ -176,6 +279,10 @@ class TransactionLog:
         self._filepath = filepath
         self._transactions: Dict[str, str] = {}
         self._transactions.update(self._load_file(filepath))
+        self._lock = threading.Lock()  # guards the transactions dict
+        self._write_lock = threading.Lock()  # serializes the writes to the file
+        self._changed = threading.Event()
+        self._persisted_empty = False  # True if the file was already removed (since the log became empty)
 
     @staticmethod
     def _load_file(filepath: str) -> Dict[str, str]:
@@ -185,8 +292,8 @@ class TransactionLog:
         :param filepath: the path of the file to read
         """
         if os.path.exists(filepath):
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+            with open(filepath, 'rb') as f:
+                data = json_loads(f.read())
             return data
         else:
             return {}
@@ -204,11 +311,9 @@ class TransactionLog:
 
         :param transaction: the transaction to add
         """
-        self._transactions[transaction.tmp_path] = transaction.org_path
-        try:
-            self.write_log()
-        except Exception:
-            self._logger.warning("Couldn't save transaction log", exc_info=True)
+        with self._lock:
+            self._transactions[transaction.tmp_path] = transaction.org_path
+        self._changed.set()
 
     def remove_transaction(self, transaction: FileSystemInputTransaction):
         """
@@ -216,41 +321,78 @@ class TransactionLog:
 
         :param transaction: the transaction to remove
         """
-        self._transactions.pop(transaction.tmp_path, None)
-        try:
-            self.write_log()
-        except Exception:
-            self._logger.warning("Couldn't save transaction log", exc_info=True)
+        self.remove_transactions([transaction])
+
+    def remove_transactions(self, transactions: List[FileSystemInputTransaction]):
+        """
+        removes several transactions from the log, with a single update
+
+        :param transactions: the transactions to remove
+        """
+        with self._lock:
+            for transaction in transactions:
+                self._transactions.pop(transaction.tmp_path, None)
+        self._changed.set()
+
+    def wait_for_changes(self, timeout: float) -> bool:
+        """
+        waits until the log was changed since the last write
+
+        :param timeout: the maximum time (in seconds) to wait
+        :return: True if the log was changed, False if the timeout has passed
+        """
+        return self._changed.wait(timeout)
 
     def rollback_all(self):
         """
         rolls back all the transaction in the log
         """
-        for tmp_path, org_path in self._transactions.items():
+        with self._lock:
+            transactions = list(self._transactions.items())
+            self._transactions.clear()
+        for tmp_path, org_path in transactions:
             try:
                 FileSystemInputTransaction.rollback_path(tmp_path=tmp_path,
                                                          org_path=org_path,
                                                          max_poison_count=FileSystemInputTransaction.MAX_POISON_COUNT)
             except AtomicMoveException:
                 self._logger.exception(f"Could not rollback file:{org_path}")
-        self._transactions.clear()
         try:
             self.write_log()
         except Exception:
             self._logger.warning("Couldn't save transaction log", exc_info=True)
+        self._changed.set()  # wakes up the transaction log thread (so it can stop, if the manager disconnects)
 
-    def write_log(self):
+    def sync(self):
         """
-        writes the transaction log to the file
+        flushes the folder of the log file to disk, so that the last write (or removal) of the log is durable.
+        the writes themselves are not synced (they are frequent, and the log is rewritten every interval anyway)
         """
-        if not self._transactions:
-            try:
-                os.remove(self._filepath)
-            except OSError:
-                pass
-        else:
-            with open(self._filepath, 'w') as f:
-                json.dump(self._transactions, f)
+        fsync_dir(os.path.dirname(self._filepath))
+
+    def write_log(self):
+        """
+        writes the transaction log to the file.
+        the log is written to a temp file, which then replaces the log file (so that the log file is never partial)
+        """
+        with self._write_lock:
+            self._changed.clear()
+            with self._lock:
+                transactions = dict(self._transactions)
+            if not transactions:
+                if self._persisted_empty:
+                    return
+                try:
+                    os.remove(self._filepath)
+                except OSError:
+                    pass
+                self._persisted_empty = True
+            else:
+                self._persisted_empty = False
+                tmp_filepath = f'{self._filepath}.tmp'
+                with open(tmp_filepath, 'wb') as f:
+                    f.write(json_dumps_bytes(transactions))  # uses orjson, if it's installed
+                os.replace(tmp_filepath, self._filepath)
 
 
 class FileSystemInputDevice(InputDevice['FileSystemInputDeviceManager']):
@@ -261,6 +403,7 @@ class FileSystemInputDevice(InputDevice['FileSystemInputDeviceManager']):
     _MAX_BATCH_SIZE = 300
     _MIN_BATCH_SIZE = 8
     _SLEEP_BETWEEN_BATCHES = 1
+    _CANCELLATION_CHECK_INTERVAL = 0.1
     STAT_HEADER_NAME = "__STAT__"
     FILENAME_HEADER_NAME = MetadataHeaders.FILENAME
 
@@ -293,6 +436,12 @@ class FileSystemInputDevice(InputDevice['FileSystemInputDeviceManager']):
         try:
             os.makedirs(self._tmp_folder, exist_ok=True)
             os.makedirs(self._input_folder, exist_ok=True)
+            # files can be moved to the tmp folder with a simple rename, if it is on the same file system
+            self._same_file_system = os.stat(self._tmp_folder).st_dev == os.stat(self._input_folder).st_dev
+            self._dir_fds: Optional[Tuple[int, int]] = None
+            if self._same_file_system and os.rename in os.supports_dir_fd:
+                self._dir_fds = (os.open(self._input_folder, os.O_RDONLY | _O_DIRECTORY),
+                                 os.open(self._tmp_folder, os.O_RDONLY | _O_DIRECTORY))
         except Exception as e:
             raise InputDeviceException('Error creating input device') from e
 
@@ -301,28 +450,65 @@ class FileSystemInputDevice(InputDevice['FileSystemInputDeviceManager']):
         self._black_listed_files: Set[str] = set()
         self._logger = logging.getLogger(__name__)
         self._serializer = serializer or DefaultFileSystemSerializer()
+        self._watcher: Optional[DirectoryWatcher] = None
+        self._watcher_created = False
+        self._rollback_condition = threading.Condition()
+        self._rollback_count = 0  # incremented on every rollback, so a rollback during a scan isn't missed
 
-    def _get_sorted_filenames(self) -> List[os.DirEntry]:
+    def _stat_input_file(self, direntry: os.DirEntry) -> Optional[os.stat_result]:
         """
-        returns a list of direntries for files under input_folder, sorted by mtime
+        stats a direntry from the input folder (the stat is cached by the direntry).
+        entries that are not regular files (i.e the poison folder) are black listed
 
-        :return: sorted list of direntries
+        :param direntry: the direntry to stat
+        :return: the stat result, or None if the entry is not a file that can be read
         """
+        if direntry.path in self._black_listed_files:
+            return None
+        try:
+            file_stat = direntry.stat()
+        except Exception:
+            return None
+        if not stat.S_ISREG(file_stat.st_mode):
+            self._black_listed_files.add(direntry.path)
+            return None
+        return file_stat
 
-        tmplist = []
-        for direntry in os.scandir(self._input_folder):
-            try:
-                if direntry.path in self._black_listed_files:
+    def _get_sorted_filenames(self) -> List[Tuple[os.DirEntry, os.stat_result]]:
+        """
+        returns a batch of the oldest direntries for files under input_folder (with their stat), sorted by mtime.
+        the batch size is the current batch size (so that a deep queue isn't sorted on every poll)
+
+        :return: sorted list of (direntry, stat) tuples
+        """
+        return heapq.nsmallest(self._current_batch_size, self._scan_input_files(), key=lambda t: t[1].st_mtime)
+
+    def _scan_input_files(self) -> List[Tuple[os.DirEntry, os.stat_result]]:
+        """
+        scans the input folder for the files that can be read (with their stat).
+        this is the same filter as '_stat_input_file', inlined into a single loop with local names,
+        since its per entry overhead dominates the scan of big queue folders
+
+        :return: list of (direntry, stat) tuples
+        """
+        black_listed_files = self._black_listed_files
+        is_regular_file = stat.S_ISREG
+        input_files: List[Tuple[os.DirEntry, os.stat_result]] = []
+        append = input_files.append
+        with os.scandir(self._input_folder) as direntries:
+            for direntry in direntries:
+                path = direntry.path
+                if path in black_listed_files:
                     continue
-                mtime = direntry.stat(follow_symlinks=False).st_mtime
-            except Exception:
-                continue
-            tmplist.append((direntry, mtime))
-        sorted_list = sorted(tmplist, key=lambda t: t[1])
-        result = []
-        for tup in sorted_list:
-            result.append(tup[0])
-        return result
+                try:
+                    file_stat = direntry.stat()
+                except Exception:
+                    continue
+                if is_regular_file(file_stat.st_mode):
+                    append((direntry, file_stat))
+                else:
+                    black_listed_files.add(path)
+        return input_files
 
     def _get_generator_files(self) -> Iterator[Optional[os.DirEntry]]:
         """
@@ -333,16 +519,15 @@ class FileSystemInputDevice(InputDevice['FileSystemInputDeviceManager']):
         """
 
         while True:
-            for direntry in os.scandir(self._input_folder):
-                yield direntry
-            yield None
+            with os.scandir(self._input_folder) as direntries:
+                yield from direntries
+            yield None  # the end of a pass over the folder, so that a batch doesn't wrap around to the same files
 
-    def _get_unsorted_filenames(self) -> List[os.DirEntry]:
+    def _get_unsorted_filenames(self) -> List[Tuple[os.DirEntry, os.stat_result]]:
         """
-        returns a batch of generator direntries for files under input_folder, unsorted
-        None when have no more direnties in the scandir
+        returns a batch of generator direntries for files under input_folder (with their stat), unsorted
 
-        :return: generator of direntries
+        :return: list of (direntry, stat) tuples
         """
         if not self._current_generator:
             self._current_generator = self._get_generator_files()
@@ -351,23 +536,23 @@ class FileSystemInputDevice(InputDevice['FileSystemInputDeviceManager']):
         for direntry in self._current_generator:
             if direntry is None:
                 break
-            try:
-                if direntry.path in self._black_listed_files:
-                    continue
-
-                if self.min_file_age > 0:
-                    file_age = time.time() - direntry.stat().st_mtime
-                    if file_age < self.min_file_age:
-                        continue
-            except Exception:
+            file_stat = self._stat_input_file(direntry)
+            if file_stat is None:
                 continue
-            batch.append(direntry)
+            if self.min_file_age > 0:
+                file_age = time.time() - file_stat.st_mtime
+                if file_age < self.min_file_age:
+                    continue
+            batch.append((direntry, file_stat))
             if len(batch) >= self._current_batch_size:
                 break
 
         self._current_batch_size = max(self._MIN_BATCH_SIZE,
                                        min(len(batch), self._current_batch_size))
-        random.shuffle(batch)
+        if len(batch) > 1:
+            # a random rotation (instead of a shuffle) is enough to spread concurrent readers over the batch
+            start = random.randrange(len(batch))
+            batch = batch[start:] + batch[:start]
 
         return batch
 
@@ -387,17 +572,10 @@ class FileSystemInputDevice(InputDevice['FileSystemInputDeviceManager']):
         """
         tries to read a single filename from queue
 
-        :param direntry: the input file to read
+        :param direntry: the input file to read (a regular file, that was already checked by _stat_input_file)
 
         :return: None, None if the file can't be read or (BytesIO, dict) if it succeeded
         """
-        if direntry.path in self._black_listed_files:
-            return None
-
-        if not direntry.is_file():
-            self._black_listed_files.add(direntry.path)
-            return None
-
         self._logger.debug(f"found input file {direntry.name} in directory {self._input_folder}")
 
         file_path = direntry.path
@@ -405,7 +583,108 @@ class FileSystemInputDevice(InputDevice['FileSystemInputDeviceManager']):
                                                     org_path=file_path,
                                                     tmp_folder=self._tmp_folder,
                                                     with_transaction=with_transaction,
-                                                    serializer=self._serializer)
+                                                    serializer=self._serializer,
+                                                    same_file_system=self._same_file_system,
+                                                    dir_fds=self._dir_fds)
+
+    def commit_batch(self, transactions: List[InputTransaction]) -> None:
+        """
+        commits the transactions, removing them from the transaction log with a single update
+        """
+        fs_transactions: List[FileSystemInputTransaction] = []
+        for transaction in transactions:
+            if isinstance(transaction, FileSystemInputTransaction) and transaction.state == TransactionState.ACTIVE:
+                fs_transactions.append(transaction)
+            else:
+                transaction.commit()
+
+        for fs_transaction in fs_transactions:
+            fs_transaction._remove_tmp_file()
+        self.manager.transaction_log.remove_transactions(fs_transactions)
+        for fs_transaction in fs_transactions:
+            fs_transaction._set_finished(TransactionState.COMMITTED)
+
+    def _wait_for_files(self, cancellation_token: threading.Event, rollback_count: int):
+        """
+        waits (up to _SLEEP_BETWEEN_BATCHES) before the next scan of the input folder.
+        where inotify is available, the wait ends as soon as a new file is written/moved into the folder.
+        otherwise, it ends when a transaction of this device is rolled back (which returns a file to the folder)
+
+        :param cancellation_token: the cancellation token for this service
+        :param rollback_count: the rollback count from before the last scan (the wait ends if it has changed)
+        """
+        if not self._watcher_created:  # created on the first wait, so devices that are never idle don't use it
+            self._watcher_created = True
+            self._watcher = DirectoryWatcher.create(self._input_folder)
+        watcher = self._watcher
+        if watcher is not None:
+            wait = watcher.wait
+        else:
+            def wait(timeout: float) -> bool:
+                return self._wait_for_rollback(timeout, rollback_count)
+
+        end_time = time.perf_counter() + self._SLEEP_BETWEEN_BATCHES
+        while not cancellation_token.is_set():
+            remaining = end_time - time.perf_counter()
+            if remaining <= 0 or wait(min(remaining, self._CANCELLATION_CHECK_INTERVAL)):
+                return
+
+    def _wait_for_rollback(self, timeout: float, rollback_count: int) -> bool:
+        """
+        waits for a transaction of this device to be rolled back
+
+        :param timeout: the maximum time (in seconds) to wait
+        :param rollback_count: the rollback count to wait for a change of
+        :return: True if a transaction was rolled back, False if the timeout has passed
+        """
+        with self._rollback_condition:
+            return self._rollback_condition.wait_for(lambda: self._rollback_count != rollback_count, timeout)
+
+    def _notify_rollback(self):
+        """
+        wakes up the readers that wait for files, after a transaction of this device was rolled back
+        """
+        with self._rollback_condition:
+            self._rollback_count += 1
+            self._rollback_condition.notify_all()
+
+    def close(self):
+        """
+        closes the directory watcher and the folder file descriptors (if any)
+        """
+        super().close()
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+        if self._dir_fds is not None:
+            dir_fds, self._dir_fds = self._dir_fds, None
+            for dir_fd in dir_fds:
+                os.close(dir_fd)
+
+    def _read_batch(self,
+                    input_files: List[Tuple[os.DirEntry, os.stat_result]],
+                    with_transaction: bool,
+                    deadline: Optional[float]) -> Optional[ReadResult]:
+        """
+        tries to read the files of a batch in order, until one of them is read
+
+        :param input_files: the batch of (direntry, stat) tuples to read
+        :param with_transaction: 'True' if the file should be read within transaction
+        :param deadline: the time (in perf_counter seconds) to stop trying at, or None to try the whole batch
+        :return: the ReadResult of the first file that was read, or None if no file could be read
+        """
+        read_file = self._read_file
+        perf_counter = time.perf_counter
+        for direntry, file_stat in input_files:
+            read_result = read_file(direntry, with_transaction=with_transaction)
+            if read_result is not None:
+                self._decrease_batch_size()
+                read_result.device_headers.update({self.FILENAME_HEADER_NAME: direntry.name,
+                                                   self.STAT_HEADER_NAME: file_stat})
+                return read_result
+            if deadline is not None and perf_counter() >= deadline:
+                break
+        return None
 
     def _read_message(self,
                       cancellation_token: threading.Event,
@@ -427,50 +706,28 @@ class FileSystemInputDevice(InputDevice['FileSystemInputDeviceManager']):
         the device headers contains the filename, and stat struct for the file
         """
         try:
-            deadline = 0.0
-            if timeout is not None:
-                deadline = time.perf_counter() + timeout
-            if self._sorted:
-                while True:
-                    input_files = self._get_sorted_filenames()
-                    for direntry in input_files:
-                        try:
-                            fs_metadata = {self.FILENAME_HEADER_NAME: direntry.name,
-                                           self.STAT_HEADER_NAME: direntry.stat()}
-                        except FileNotFoundError:  # file was deleted before we read it
-                            continue
-                        read_result = self._read_file(direntry, with_transaction=with_transaction)
-                        if read_result is not None:
-                            read_result.device_headers.update(fs_metadata)
-                            return read_result
-                        if timeout is not None and time.perf_counter() >= deadline:
-                            break
-
-                    if timeout is not None and time.perf_counter() >= deadline:
-                        break
-                    cancellation_token.wait(self._SLEEP_BETWEEN_BATCHES)
-            else:
-                while True:
-                    got_file = False
-                    for direntry in self._get_unsorted_filenames():
-                        got_file = True
-                        try:
-                            fs_metadata = {self.FILENAME_HEADER_NAME: direntry.name,
-                                           self.STAT_HEADER_NAME: direntry.stat()}
-                        except FileNotFoundError:  # file was deleted before we read it
-                            continue
-                        read_result = self._read_file(direntry, with_transaction=with_transaction)
-                        if read_result is not None:
-                            self._decrease_batch_size()
-                            read_result.device_headers.update(fs_metadata)
-                            return read_result
-
+            deadline = None if timeout is None else time.perf_counter() + timeout
+            while True:
+                batch_size = self._current_batch_size
+                rollback_count = self._rollback_count
+                input_files = self._get_sorted_filenames() if self._sorted else self._get_unsorted_filenames()
+                read_result = self._read_batch(input_files, with_transaction=with_transaction, deadline=deadline)
+                if read_result is not None:
+                    return read_result
+
+                if not self._sorted:
                     # couldn't read any file from batch. try bigger batch next time
                     self._increase_batch_size()
-                    if timeout is not None and time.perf_counter() >= deadline:
-                        break
-                    if not got_file:
-                        cancellation_token.wait(self._SLEEP_BETWEEN_BATCHES)
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                if self._sorted:
+                    if len(input_files) < batch_size:
+                        self._wait_for_files(cancellation_token, rollback_count)
+                    else:
+                        # a full batch, that couldn't be read (i.e taken by other readers). try a bigger batch
+                        self._increase_batch_size()
+                elif not input_files:
+                    self._wait_for_files(cancellation_token, rollback_count)
 
             return None
 
@@ -511,7 +768,7 @@ class FileSystemInputDeviceManager(FileSystemDeviceManagerBase, InputDeviceManag
 
         self._fifo = fifo
         self._min_input_file_age = min_input_file_age
-        transaction_log_filename = os.path.join(self.bookkeeping_folder, f'{self._unique_manager_id}.transactionlog')
+        transaction_log_filename = os.path.join(self.bookkeeping_folder, f'{self.unique_manager_id}.transactionlog')
         self._transaction_log = TransactionLog(transaction_log_filename)
         self._transaction_log_save_interval = transaction_log_save_interval
         self._should_stop: threading.Event = threading.Event()
@@ -520,41 +777,58 @@ class FileSystemInputDeviceManager(FileSystemDeviceManagerBase, InputDeviceManag
 
     def _do_transaction_log_thread(self):
         """
-        a thread that looks for old transaction logs, and rolls them back
+        a thread that writes the transaction log when it changes, and looks for old transaction logs to roll them back
         """
+        next_scan_time = 0.0
         while not self._should_stop.is_set():
             try:
-                self._transaction_log.write_log()
-                now = time.time()
-                for direntry in os.scandir(self.bookkeeping_folder):
-                    try:
-                        if not direntry.is_file():
-                            continue
-                        transaction_log_file = direntry.path
-                        if not transaction_log_file.endswith(".transactionlog"):
-                            continue
-                        file_age = now - direntry.stat().st_mtime
-                        if file_age < self._transaction_log_save_interval * 3:
-                            # don't roll back transaction logs that are too new (might be a file of another pod/process)
-                            continue
-
-                        temp_transaction_log_file_name = f'{transaction_log_file}.rolling_back.{randint(0, 10000)}'
-                        os.rename(src=transaction_log_file, dst=temp_transaction_log_file_name)
-                    except FileNotFoundError:
-                        continue  # Couldn't handle the file, because someone else got to it first
-
-                    try:
-                        transaction_log = TransactionLog(temp_transaction_log_file_name)
-                        transaction_log.rollback_all()
-                    except Exception:
-                        self._logger.exception(f"Error rolling back {transaction_log_file} file. removing")
-                    finally:
-                        if os.path.exists(temp_transaction_log_file_name):
-                            os.remove(temp_transaction_log_file_name)
+                self._transaction_log.write_log()  # also keeps the log file fresh, so others don't roll it back
+            except Exception:
+                self._logger.exception("Couldn't save transaction log")
+
+            now = time.time()
+            if now >= next_scan_time:
+                # scan for old logs at most once in an interval, so we won't spam
+                next_scan_time = now + self._transaction_log_save_interval
+                try:
+                    self._rollback_old_transaction_logs(now)
+                except Exception:
+                    self._logger.exception('Error in transaction_log thread')
+
+            # wakes up when the transaction log changes (several changes are written together), or on the next scan
+            self._transaction_log.wait_for_changes(max(0.0, next_scan_time - time.time()))
+
+    def _rollback_old_transaction_logs(self, now: float):
+        """
+        rolls back the transaction logs that were not updated for a while (their process probably died)
+
+        :param now: the current time
+        """
+        for direntry in os.scandir(self.bookkeeping_folder):
+            try:
+                if not direntry.is_file():
+                    continue
+                transaction_log_file = direntry.path
+                if not transaction_log_file.endswith(".transactionlog"):
+                    continue
+                file_age = now - direntry.stat().st_mtime
+                if file_age < self._transaction_log_save_interval * 3:
+                    # don't roll back transaction logs that are too new (might be a file of another pod/process)
+                    continue
+
+                temp_transaction_log_file_name = f'{transaction_log_file}.rolling_back.{randint(0, 10000)}'
+                os.rename(src=transaction_log_file, dst=temp_transaction_log_file_name)
+            except FileNotFoundError:
+                continue  # Couldn't handle the file, because someone else got to it first
+
+            try:
+                transaction_log = TransactionLog(temp_transaction_log_file_name)
+                transaction_log.rollback_all()
             except Exception:
-                self._logger.exception('Error in transaction_log thread')
-            # sleep for at least a few seconds, so we won't spam
-            self._should_stop.wait(self._transaction_log_save_interval)
+                self._logger.exception(f"Error rolling back {transaction_log_file} file. removing")
+            finally:
+                if os.path.exists(temp_transaction_log_file_name):
+                    os.remove(temp_transaction_log_file_name)
 
     @property
     def transaction_log(self) -> TransactionLog:
@@ -599,3 +873,4 @@ class FileSystemInputDeviceManager(FileSystemDeviceManagerBase, InputDeviceManag
         """
         self._should_stop.set()
         self._transaction_log.rollback_all()
+        self._transaction_log.sync()
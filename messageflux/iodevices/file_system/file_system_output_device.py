@@ -1,3 +1,4 @@
+import errno
 import logging
 import os
 import shutil
@@ -67,7 +68,7 @@ class FileSystemOutputDevice(OutputDevice['FileSystemOutputDeviceManager']):
             filename = ''
             try:
                 if self._format:
-                    filename = self._format.format(**message.headers)
+                    filename = self._format.format_map(message.headers)
             except KeyError:
                 self._logger.error(
                     'Filename format isn\'t satisfied, format:{}, headers:{}, puts default filename instead'.format(
@@ -79,12 +80,16 @@ class FileSystemOutputDevice(OutputDevice['FileSystemOutputDeviceManager']):
                                                        uuid=get_random_id())
             tmp_fullpath = os.path.join(self._tmp_folder, filename)
             with open(tmp_fullpath, 'wb') as f:
-                stream_to_write = self._serializer.serialize(message=message)
-                f.write(stream_to_write.read())
+                self._serializer.serialize_to(message, f)
 
             os.chmod(tmp_fullpath, 0o777)
             final_fullpath = os.path.join(self._output_folder, filename)
-            shutil.move(tmp_fullpath, final_fullpath)
+            try:
+                os.replace(tmp_fullpath, final_fullpath)  # a single atomic rename
+            except OSError as ex:
+                if ex.errno != errno.EXDEV:
+                    raise
+                shutil.move(tmp_fullpath, final_fullpath)  # the output folder is on another file system
             self._logger.debug(f'Wrote product to path {final_fullpath}')
         except Exception as e:
             raise OutputDeviceException('Error writing to device') from e
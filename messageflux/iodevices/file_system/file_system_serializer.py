@@ -1,17 +1,18 @@
-import json
+import shutil
 import zipfile
 from abc import ABCMeta, abstractmethod
-from io import BytesIO
-from typing import BinaryIO
+from io import BytesIO, SEEK_END
+from typing import BinaryIO, Optional
 
 from messageflux.iodevices.base import Message
-from messageflux.utils import json_safe_encoder
+from messageflux.utils import json_dumps_bytes, json_loads
 
 
 class FileSystemSerializerBase(metaclass=ABCMeta):
     """
     this is a base class for FileSystemSerializer
     """
+    _COPY_BUFFER_SIZE = 1024 * 1024
 
     @abstractmethod
     def serialize(self, message: Message) -> BinaryIO:
@@ -23,6 +24,17 @@ class FileSystemSerializerBase(metaclass=ABCMeta):
         """
         raise NotImplementedError()
 
+    def serialize_to(self, message: Message, out: BinaryIO) -> None:
+        """
+        serializes the message into a writable stream (i.e an open file).
+        serializers that can write the message directly (without building the serialized stream in memory first)
+        should override this method. the default implementation copies the stream returned by 'serialize'
+
+        :param message: the message to serialize
+        :param out: the stream to write the serialized message to
+        """
+        shutil.copyfileobj(self.serialize(message), out, self._COPY_BUFFER_SIZE)
+
     @abstractmethod
     def deserialize(self, stream: BinaryIO) -> Message:
         """
@@ -47,13 +59,19 @@ class ConcatFileSystemSerializer(FileSystemSerializerBase):
         :param message: the message to serialize
         :return: a stream containing the serialized message
         """
-        headers_bytes = json.dumps(message.headers, default=json_safe_encoder).encode()
-        result = BytesIO()
-        result.write(headers_bytes)
-        result.write(b'\n')
-        result.write(message.bytes)
-        result.seek(0)
-        return result
+        # a single join (instead of growing a BytesIO with several writes). the headers line has no newlines in it
+        return BytesIO(b'\n'.join((json_dumps_bytes(message.headers), message.bytes)))
+
+    def serialize_to(self, message: Message, out: BinaryIO) -> None:
+        """
+        writes the headers line and the message bytes directly to the stream
+
+        :param message: the message to serialize
+        :param out: the stream to write the serialized message to
+        """
+        out.write(json_dumps_bytes(message.headers))
+        out.write(b'\n')
+        out.write(message.bytes)
 
     def deserialize(self, stream: BinaryIO) -> Message:
         """
@@ -64,7 +82,7 @@ class ConcatFileSystemSerializer(FileSystemSerializerBase):
         """
         first_line = stream.readline()
         rest = stream.read()
-        headers = json.loads(first_line.decode())
+        headers = json_loads(first_line)
         data = BytesIO(rest)
         return Message(data, headers)
 
@@ -83,6 +101,15 @@ class NoHeadersFileSystemSerializer(FileSystemSerializerBase):
         """
         return message.stream
 
+    def serialize_to(self, message: Message, out: BinaryIO) -> None:
+        """
+        writes the message bytes directly to the stream
+
+        :param message: the message to serialize
+        :param out: the stream to write the serialized message to
+        """
+        out.write(message.bytes)
+
     def deserialize(self, stream: BinaryIO) -> Message:
         """
         deserializes the stream into the stream of the message
@@ -100,6 +127,15 @@ class ZIPFileSystemSerializer(FileSystemSerializerBase):
     HEADERS_FILENAME = 'headers'
     BYTES_FILENAME = 'bytes'
 
+    def __init__(self, compression: int = zipfile.ZIP_STORED, compresslevel: Optional[int] = None):
+        """
+        :param compression: the zip compression method to write with (i.e zipfile.ZIP_DEFLATED).
+        the default is no compression. reading works with any method
+        :param compresslevel: the compression level to write with (None for the default level of the method)
+        """
+        self._compression = compression
+        self._compresslevel = compresslevel
+
     def serialize(self, message: Message) -> BinaryIO:
         """
         serializes the message into a stream to write to file
@@ -107,15 +143,33 @@ class ZIPFileSystemSerializer(FileSystemSerializerBase):
         :param message: the message to serialize
         :return: a stream containing the serialized message
         """
-        headers_bytes = json.dumps(message.headers, default=json_safe_encoder).encode()
         zip_filebuf = BytesIO()
-
-        with zipfile.ZipFile(zip_filebuf, mode='w') as zip_file:
-            zip_file.writestr(self.BYTES_FILENAME, message.bytes)
-            zip_file.writestr(self.HEADERS_FILENAME, headers_bytes)
+        self.serialize_to(message, zip_filebuf)
         zip_filebuf.seek(0)
         return zip_filebuf
 
+    def serialize_to(self, message: Message, out: BinaryIO) -> None:
+        """
+        writes the zip file directly to the stream
+
+        :param message: the message to serialize
+        :param out: the stream to write the serialized message to
+        """
+        headers_bytes = json_dumps_bytes(message.headers)
+        stream = message.stream
+        position = stream.tell()
+        size = stream.seek(0, SEEK_END) - position
+        stream.seek(position)
+        with zipfile.ZipFile(out,
+                             mode='w',
+                             compression=self._compression,
+                             compresslevel=self._compresslevel) as zip_file:
+            # the payload is copied to the zip in chunks, instead of reading it whole into memory first
+            with zip_file.open(self.BYTES_FILENAME, mode='w', force_zip64=size * 1.05 > zipfile.ZIP64_LIMIT) as entry:
+                shutil.copyfileobj(stream, entry, self._COPY_BUFFER_SIZE)
+            stream.seek(position)
+            zip_file.writestr(self.HEADERS_FILENAME, headers_bytes)
+
     def deserialize(self, stream: BinaryIO) -> Message:
         """
         deserializes the message from the stream
@@ -127,7 +181,7 @@ class ZIPFileSystemSerializer(FileSystemSerializerBase):
             headers_data = zip_file.read(self.HEADERS_FILENAME)
             bytes_data = zip_file.read(self.BYTES_FILENAME)
 
-        headers = json.loads(headers_data.decode())
+        headers = json_loads(headers_data)
         data = BytesIO(bytes_data)
         return Message(data, headers)
 
@@ -1,9 +1,9 @@
-import heapq
 import threading
 import time
-from functools import total_ordering
+from collections import deque
+from itertools import count
 from threading import Condition
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Tuple, Callable, Deque
 
 from messageflux.iodevices.base import (Message,
                                         InputDeviceManager,
@@ -17,26 +17,76 @@ from messageflux.iodevices.base.input_transaction import NULLTransaction
 
 MESSAGE_TIMESTAMP_HEADER = 'message_timestamp'
 
+_ReadyCallbacks = List[Callable[[], None]]
+
+
+def _notify_ready(ready_callbacks: _ReadyCallbacks):
+    for callback in list(ready_callbacks):
+        callback()
+
+
+_message_sequence = count()
+
 
-@total_ordering
 class _QueueMessage:
     """
-    an object containing a message in the queue
+    an object containing a message in the queue.
+    the message is copied when it is sent (the sender may keep using its own message),
+    and again when it is read within a transaction (so that a rollback returns the message intact)
     """
+    __slots__ = 'message', 'timestamp', 'sequence'
 
     def __init__(self, message: Message, timestamp: Optional[float] = None):
         self.message = message.copy()
         self.timestamp = timestamp or time.time()
-        self._monotonic_time = time.perf_counter_ns()
+        self.sequence = next(_message_sequence)  # the send order of the message (kept when it is rolled back)
+
+
+class _QueueCondition(Condition):
+    """
+    the condition of a queue. it uses a plain lock (the queue lock is never reentered),
+    and counts its waiters, so that sending to a queue that no reader waits on, doesn't notify
+    """
+
+    def __init__(self):
+        super().__init__(threading.Lock())
+        self._waiting_count = 0
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        waits until notified or until the timeout passes (must be called with the lock acquired)
+        """
+        self._waiting_count += 1
+        try:
+            return super().wait(timeout)
+        finally:
+            self._waiting_count -= 1
+
+    def notify(self, n: int = 1) -> None:
+        """
+        wakes up n waiters, if there are any (must be called with the lock acquired)
+        """
+        if self._waiting_count:
+            super().notify(n)
 
-    def __eq__(self, other):
-        if not isinstance(other, _QueueMessage):
-            return False
-        return self._monotonic_time == other._monotonic_time
 
-    def __lt__(self, other):
-        assert isinstance(other, _QueueMessage)
-        return self._monotonic_time < other._monotonic_time
+def _return_to_queue(queue: Deque[_QueueMessage], message: _QueueMessage):
+    """
+    returns a rolled back message to its original place in the queue (by send order).
+    this is usually the head of the queue, so the queue is scanned only when several messages are rolled back
+    out of order
+
+    :param queue: the queue to return the message to
+    :param message: the message to return
+    """
+    if not queue or message.sequence < queue[0].sequence:
+        queue.appendleft(message)
+        return
+    for index, queue_message in enumerate(queue):
+        if message.sequence < queue_message.sequence:
+            queue.insert(index, message)
+            return
+    queue.append(message)
 
 
 class InMemoryInputDevice(InputDevice['InMemoryDeviceManager']):
@@ -48,11 +98,13 @@ class InMemoryInputDevice(InputDevice['InMemoryDeviceManager']):
         """
         a transaction object for the in memory device
         """
+        __slots__ = '_message'
+
+        _device: 'InMemoryInputDevice'
 
         def __init__(self, device: 'InMemoryInputDevice', message: _QueueMessage):
             super().__init__(device=device)
             self._message = message
-            self._device: InMemoryInputDevice = device
 
         def _commit(self):
             pass
@@ -65,14 +117,16 @@ class InMemoryInputDevice(InputDevice['InMemoryDeviceManager']):
 
     def __init__(self, manager: 'InMemoryDeviceManager',
                  name: str,
-                 queue: List[_QueueMessage],
-                 queue_not_empty_condition: Condition):
+                 queue: Deque[_QueueMessage],
+                 queue_not_empty_condition: Condition,
+                 ready_callbacks: Optional[_ReadyCallbacks] = None):
 
         super().__init__(manager=manager,
                          name=name)
 
         self._queue = queue
         self._queue_not_empty = queue_not_empty_condition
+        self._ready_callbacks = ready_callbacks if ready_callbacks is not None else []
 
     def _read_message(self,
                       cancellation_token: threading.Event,
@@ -80,15 +134,19 @@ class InMemoryInputDevice(InputDevice['InMemoryDeviceManager']):
                       with_transaction: bool = True) -> Optional[ReadResult]:
 
         with self._queue_not_empty:
-            if self._queue_not_empty.wait_for(lambda: any(self._queue), timeout):
-                queue_message = heapq.heappop(self._queue)
+            if self._queue_not_empty.wait_for(self._queue.__len__, timeout):
+                queue_message = self._queue.popleft()
                 transaction: InputTransaction
+                message = queue_message.message
                 if with_transaction:
                     transaction = self.InMemoryTransaction(self, queue_message)
+                    # the queued message is kept intact for rollback, so the reader gets a copy of it
+                    message = message.copy()
                 else:
+                    # the message can't return to the queue, so the reader can have the queued message itself
                     transaction = NULLTransaction(self)
                 device_headers = {MESSAGE_TIMESTAMP_HEADER: queue_message.timestamp}
-                return ReadResult(message=queue_message.message.copy(),
+                return ReadResult(message=message,
                                   device_headers=device_headers,
                                   transaction=transaction)
             else:
@@ -96,8 +154,25 @@ class InMemoryInputDevice(InputDevice['InMemoryDeviceManager']):
 
     def _push_to_queue(self, message: _QueueMessage):
         with self._queue_not_empty:
-            heapq.heappush(self._queue, message)
+            _return_to_queue(self._queue, message)
             self._queue_not_empty.notify()
+        _notify_ready(self._ready_callbacks)
+
+    def register_ready_callback(self, callback: Callable[[], None]) -> bool:
+        """
+        registers a callback that is called when a message is pushed to the queue
+        """
+        with self._queue_not_empty:
+            self._ready_callbacks.append(callback)
+        return True
+
+    def unregister_ready_callback(self, callback: Callable[[], None]) -> None:
+        """
+        unregisters a callback that was registered using 'register_ready_callback'
+        """
+        with self._queue_not_empty:
+            if callback in self._ready_callbacks:
+                self._ready_callbacks.remove(callback)
 
 
 class InMemoryOutputDevice(OutputDevice['InMemoryDeviceManager']):
@@ -107,14 +182,16 @@ class InMemoryOutputDevice(OutputDevice['InMemoryDeviceManager']):
 
     def __init__(self, manager: 'InMemoryDeviceManager',
                  name: str,
-                 queue: List[_QueueMessage],
-                 queue_not_empty_condition: Condition):
+                 queue: Deque[_QueueMessage],
+                 queue_not_empty_condition: Condition,
+                 ready_callbacks: Optional[_ReadyCallbacks] = None):
 
         super().__init__(manager=manager,
                          name=name)
 
         self._queue = queue
         self._queue_not_empty = queue_not_empty_condition
+        self._ready_callbacks = ready_callbacks if ready_callbacks is not None else []
 
     def _send_message(self, message_bundle: MessageBundle):
         """
@@ -123,8 +200,9 @@ class InMemoryOutputDevice(OutputDevice['InMemoryDeviceManager']):
         :param message_bundle: the message bundle to send
         """
         with self._queue_not_empty:
-            heapq.heappush(self._queue, _QueueMessage(message_bundle.message))
+            self._queue.append(_QueueMessage(message_bundle.message))
             self._queue_not_empty.notify()
+        _notify_ready(self._ready_callbacks)
 
 
 class InMemoryDeviceManager(InputDeviceManager[InMemoryInputDevice], OutputDeviceManager[InMemoryOutputDevice]):
@@ -135,18 +213,15 @@ class InMemoryDeviceManager(InputDeviceManager[InMemoryInputDevice], OutputDevic
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self._queues: Dict[str, Tuple[List[_QueueMessage], Condition]] = {}
+        self._queues: Dict[str, Tuple[Deque[_QueueMessage], Condition, _ReadyCallbacks]] = {}
 
-    def _get_queue_tuple(self, name: str) -> Tuple[List[_QueueMessage], Condition]:
+    def _get_queue_tuple(self, name: str) -> Tuple[Deque[_QueueMessage], Condition, _ReadyCallbacks]:
         res = self._queues.get(name, None)
-        if res is not None:
-            queue, condition = res
-        else:
-            queue = []
-            condition = Condition()
-            self._queues[name] = (queue, condition)
+        if res is None:
+            res = (deque(), _QueueCondition(), [])
+            self._queues[name] = res
 
-        return queue, condition
+        return res
 
     def _create_input_device(self, name: str) -> InMemoryInputDevice:
         """
@@ -155,9 +230,9 @@ class InMemoryDeviceManager(InputDeviceManager[InMemoryInputDevice], OutputDevic
         :param name: the name of the input device to create
         :return: the created input device
         """
-        queue, condition = self._get_queue_tuple(name)
+        queue, condition, ready_callbacks = self._get_queue_tuple(name)
 
-        return InMemoryInputDevice(self, name, queue, condition)
+        return InMemoryInputDevice(self, name, queue, condition, ready_callbacks)
 
     def _create_output_device(self, name: str) -> InMemoryOutputDevice:
         """
@@ -166,5 +241,5 @@ class InMemoryDeviceManager(InputDeviceManager[InMemoryInputDevice], OutputDevic
         :param name: the name of the output device to create
         :return: the created output device
         """
-        queue, condition = self._get_queue_tuple(name)
-        return InMemoryOutputDevice(self, name, queue, condition)
+        queue, condition, ready_callbacks = self._get_queue_tuple(name)
+        return InMemoryOutputDevice(self, name, queue, condition, ready_callbacks)
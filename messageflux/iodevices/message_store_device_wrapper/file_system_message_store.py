@@ -1,14 +1,20 @@
+import errno
 import logging
 import os
 import posixpath
 import random
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+from typing import List, Tuple
 
 from messageflux.iodevices.base.common import MessageBundle
 from messageflux.iodevices.file_system import DefaultFileSystemSerializer
-from messageflux.iodevices.message_store_device_wrapper.message_store_base import MessageStoreBase
+from messageflux.iodevices.message_store_device_wrapper.message_store_base import MessageStoreBase, \
+    MessageStoreException
 from messageflux.metadata_headers import MetadataHeaders
 from messageflux.utils import get_random_id
+from messageflux.utils.filesystem import read_file_bytes
 
 
 class FileSystemMessageStore(MessageStoreBase):
@@ -29,6 +35,7 @@ class FileSystemMessageStore(MessageStoreBase):
         self._logger = logging.getLogger(__name__)
         self._num_of_subdirs = num_of_subdirs
         self._serializer = DefaultFileSystemSerializer()
+        self._current_date: Tuple[float, str] = (0, '')  # (the time the date string expires, the date string)
 
     def connect(self):
         """
@@ -58,8 +65,7 @@ class FileSystemMessageStore(MessageStoreBase):
         :return: the Message
         """
         file_path = self.get_absolute_path(key)
-        with open(file_path, 'rb') as f:
-            message = self._serializer.deserialize(f)
+        message = self._serializer.deserialize(BytesIO(read_file_bytes(file_path)))
 
         return MessageBundle(message, {MetadataHeaders.FILENAME: file_path})
 
@@ -71,11 +77,26 @@ class FileSystemMessageStore(MessageStoreBase):
         :return: The relative path to use together with the root path in order to save the file.
         """
         filename = get_random_id() + ".FSMS"
-        current_date = datetime.now().strftime(self.DATE_FORMAT)
-        random_str = str(random.randint(0, self._num_of_subdirs))
+        current_date = self._get_current_date()
+        random_str = str(random.randrange(self._num_of_subdirs + 1))
         subdir = f'{current_date}-{random_str}'
         return posixpath.join(subdir, filename)
 
+    def _get_current_date(self) -> str:
+        """
+        returns the current (local) date formatted with DATE_FORMAT.
+        the formatted date is cached until the next midnight, so strftime is called only once a day
+
+        :return: the formatted current date
+        """
+        expiry, current_date = self._current_date
+        if time.time() >= expiry:
+            now = datetime.now()
+            current_date = now.strftime(self.DATE_FORMAT)
+            expiry = datetime.combine(now.date() + timedelta(days=1), datetime.min.time()).timestamp()
+            self._current_date = (expiry, current_date)
+        return current_date
+
     def get_absolute_path(self, relative_path: str) -> str:
         """
         Convert a relative path that was returned by "generate_relative_path" into the path where the file is at.
@@ -97,10 +118,15 @@ class FileSystemMessageStore(MessageStoreBase):
         relative_path = self.generate_relative_path()
         file_path = self.get_absolute_path(relative_path)
 
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-        with open(file_path, 'wb') as f:
-            f.write(self._serializer.serialize(message_bundle.message).read())
+        # the subdir usually exists already, so it is created only if opening the file fails
+        # (a set of created subdirs wouldn't do, since 'delete_message' removes them when they become empty)
+        try:
+            f = open(file_path, 'wb')
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            f = open(file_path, 'wb')
+        with f:
+            self._serializer.serialize_to(message_bundle.message, f)
 
         os.chmod(file_path, 0o777)
         return relative_path
@@ -113,8 +139,41 @@ class FileSystemMessageStore(MessageStoreBase):
         """
         file_path = self.get_absolute_path(key)
         os.remove(file_path)
-        subdir = os.path.dirname(file_path)
+        self._remove_subdir(os.path.dirname(file_path))
+
+    def delete_messages(self, keys: List[str]):
+        """
+        deletes multiple messages from the message store.
+        the files are removed first, and then each of their subdirs is removed (if empty) once
+
+        :param list[str] keys: the list of keys to the messages
+        """
+        failures = []
+        subdirs = set()
+        for key in keys:
+            try:
+                file_path = self.get_absolute_path(key)
+                subdirs.add(os.path.dirname(file_path))
+                os.remove(file_path)
+            except Exception as ex:
+                failures.append(ex)
+
+        for subdir in subdirs:
+            self._remove_subdir(subdir)
+
+        if failures:
+            raise MessageStoreException(
+                "Error deleting {} out of {} messages from store".format(len(failures), len(keys)),
+                inner_exceptions=failures)
+
+    def _remove_subdir(self, subdir: str):
+        """
+        removes a subdir, if it is empty
+
+        :param subdir: the subdir to remove
+        """
         try:
             os.rmdir(subdir)
-        except OSError:
-            self._logger.warning(f'Could not delete directory {subdir}', exc_info=True)
+        except OSError as ex:
+            if ex.errno not in (errno.ENOTEMPTY, errno.EEXIST):  # a subdir that still has files is not an error
+                self._logger.warning(f'Could not delete directory {subdir}', exc_info=True)
@@ -12,6 +12,7 @@ class MessageStoreInputTransactionWrapper(InputTransaction):
     """
     represents an Message Store wrapper transaction
     """
+    __slots__ = '_inner_transaction', '_delete_on_commit', '_message_store', '_key'
 
     _logger = logging.getLogger(__name__)
 
@@ -19,6 +19,7 @@ class _MessageStoreTransformerBase:
         self._full_magic = b"|".join([self.MAGIC_HEADER,
                                       self._message_store.magic
                                       ])
+        self._full_magic_len = len(self._full_magic)
 
     def __enter__(self) -> '_MessageStoreTransformerBase':
         self._message_store.__enter__()
@@ -55,7 +56,7 @@ class _MessageStoreTransformerBase:
         :param bytes data: the data from the wire
         :return: deserialized key
         """
-        key = data[len(self._full_magic):]
+        key = data[self._full_magic_len:]
         return key.decode()
 
     def is_key(self, stream: BinaryIO) -> bool:
@@ -65,6 +66,6 @@ class _MessageStoreTransformerBase:
         :param stream: the data from the wire
         :return: True if it is a serialized key
         """
-        magic = stream.read(len(self._full_magic))
+        magic = stream.read(self._full_magic_len)
         stream.seek(0)
         return magic == self._full_magic
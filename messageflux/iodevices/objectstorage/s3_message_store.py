@@ -1,18 +1,26 @@
 import json
 import os
 import re
+import threading
 from abc import abstractmethod, ABCMeta
 from hashlib import md5
-from typing import Optional, BinaryIO, Dict, Any, Tuple, TYPE_CHECKING
+from io import BytesIO
+from typing import Optional, BinaryIO, Dict, Any, Tuple, TYPE_CHECKING, List
 
 import boto3
 
+try:
+    import xxhash
+    _XXHASH_INSTALLED = True
+except ImportError:
+    _XXHASH_INSTALLED = False
+
 from messageflux.iodevices.base.common import MessageBundle, Message
 from messageflux.iodevices.message_store_device_wrapper.message_store_base import MessageStoreException, \
     MessageStoreBase
 from messageflux.iodevices.objectstorage.s3api.s3bucket import BUCKET_NAME_VALIDATOR, S3Bucket
 from messageflux.metadata_headers import MetadataHeaders
-from messageflux.utils import get_random_id, json_safe_encoder
+from messageflux.utils import get_random_id, json_safe_encoder, json_dumps_bytes, json_loads
 
 if TYPE_CHECKING:
     from mypy_boto3_s3 import S3ServiceResource
@@ -23,6 +31,30 @@ _S3_TIMEOUT = int(os.environ.get("S3_TIMEOUT", 1))
 _S3_RETRIES = int(os.environ.get("S3_RETRIES", 2))
 
 
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _content_hash(message: Message) -> str:
+    """
+    hashes the content of a message (to make its key unique). the hash is not used for security,
+    so xxh3_128 is used when it's installed (it is much faster than md5, and has the same digest length).
+    a stream that isn't in memory already is hashed in chunks, so the payload isn't read into memory whole
+
+    :param message: the message to hash
+    :return: the hex digest of the content
+    """
+    hasher: Any = xxhash.xxh3_128() if _XXHASH_INSTALLED else md5()
+    stream = message.stream
+    if isinstance(stream, BytesIO):
+        hasher.update(message.bytes)  # reading a BytesIO whole shares its buffer, without copying it
+    else:
+        position = stream.tell()
+        for chunk in iter(lambda: stream.read(_HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+        stream.seek(position)
+    return hasher.hexdigest()
+
+
 class BucketNameFormatterBase:
     """
     a base class for formatter to manipulate the bucket name in case it needs to be different then the device name
@@ -91,6 +123,7 @@ class _S3MessageStoreBase(MessageStoreBase, metaclass=ABCMeta):
         self._s3_resource = s3_resource
         self._auto_create_bucket = auto_create_bucket
         self._bucket_cache: Dict[str, S3Bucket] = {}
+        self._bucket_cache_lock = threading.Lock()
 
     def _get_bucket(self, bucket_name: str, auto_create=False) -> S3Bucket:
         """
@@ -98,8 +131,12 @@ class _S3MessageStoreBase(MessageStoreBase, metaclass=ABCMeta):
         """
         bucket = self._bucket_cache.get(bucket_name, None)
         if bucket is None:
-            bucket = S3Bucket(bucket_name, self._s3_resource, auto_create=auto_create)
-            self._bucket_cache[bucket_name] = bucket
+            # creating the bucket object sends a request to s3, so concurrent misses create it only once
+            with self._bucket_cache_lock:
+                bucket = self._bucket_cache.get(bucket_name, None)
+                if bucket is None:
+                    bucket = S3Bucket(bucket_name, self._s3_resource, auto_create=auto_create)
+                    self._bucket_cache[bucket_name] = bucket
 
         return bucket
 
@@ -119,7 +156,7 @@ class _S3MessageStoreBase(MessageStoreBase, metaclass=ABCMeta):
         :return: serialized key to send
         """
         data_dict = {'bucket_name': bucket.name, 'key': key}
-        return json.dumps(data_dict)
+        return json_dumps_bytes(data_dict).decode()
 
     def deserialize_key(self, data: str) -> Tuple[str, str]:
         """
@@ -128,16 +165,19 @@ class _S3MessageStoreBase(MessageStoreBase, metaclass=ABCMeta):
         :param data: the data from the wire
         :return: deserialized (bucket name, key)
         """
-        data_dict: Dict[str, Any] = json.loads(data)
+        data_dict: Dict[str, Any] = json_loads(data)
         bucket_name = str(data_dict['bucket_name'])
         key = str(data_dict['key'])
         return bucket_name, key
 
     def _serialize_headers(self, headers: Dict[str, Any]) -> Dict[str, str]:
-        return {self._ORIGINAL_HEADERS_KEY: json.dumps(headers, default=json_safe_encoder)}
+        data = json_dumps_bytes(headers)
+        if not data.isascii():  # s3 metadata must be ascii, and only json.dumps escapes non ascii characters
+            return {self._ORIGINAL_HEADERS_KEY: json.dumps(headers, default=json_safe_encoder)}
+        return {self._ORIGINAL_HEADERS_KEY: data.decode('ascii')}
 
     def _deserialize_headers(self, headers: Dict[str, str]) -> Dict[str, Any]:
-        return json.loads(headers.get(self._ORIGINAL_HEADERS_KEY, '{}'))
+        return json_loads(headers.get(self._ORIGINAL_HEADERS_KEY, '{}'))
 
     @abstractmethod
     def _read_message_from_bucket(self, bucket: S3Bucket, key: str) -> Tuple[BinaryIO, Dict[str, Any]]:
@@ -174,7 +214,7 @@ class _S3MessageStoreBase(MessageStoreBase, metaclass=ABCMeta):
         """
         bucket_name = self.bucket_name_formatter.format_name(device_name, message_bundle)
         bucket = self._get_bucket(bucket_name=bucket_name, auto_create=self._auto_create_bucket)
-        data_hash = md5(message_bundle.message.bytes).hexdigest()
+        data_hash = _content_hash(message_bundle.message)
         key = \
             message_bundle.message.headers.get(KEY_HEADER_CONST) or \
             message_bundle.device_headers.get(MetadataHeaders.ITEM_ID) or \
@@ -197,6 +237,35 @@ class _S3MessageStoreBase(MessageStoreBase, metaclass=ABCMeta):
         bucket = self._get_bucket(bucket_name=bucket_name)
         bucket.delete_object(s3_key)
 
+    def delete_messages(self, keys: List[str]):
+        """
+        deletes multiple messages from the message store.
+        the keys are grouped by bucket, and each bucket deletes its keys in batched requests
+
+        :param list[str] keys: the list of keys to the messages
+        """
+        failures: List[Exception] = []
+        keys_per_bucket: Dict[str, List[str]] = {}
+        for key in keys:
+            try:
+                bucket_name, s3_key = self.deserialize_key(key)
+            except Exception as ex:
+                failures.append(ex)
+                continue
+            keys_per_bucket.setdefault(bucket_name, []).append(s3_key)
+
+        for bucket_name, s3_keys in keys_per_bucket.items():
+            try:
+                bucket = self._get_bucket(bucket_name=bucket_name)
+                failures.extend(bucket.delete_objects(s3_keys).values())
+            except Exception as ex:
+                failures.append(ex)
+
+        if failures:
+            raise MessageStoreException(
+                "Error deleting {} out of {} messages from store".format(len(failures), len(keys)),
+                inner_exceptions=failures)
+
 
 class S3MessageStore(_S3MessageStoreBase):
     """
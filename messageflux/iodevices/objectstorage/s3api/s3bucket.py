@@ -2,7 +2,7 @@ import json
 import re
 from datetime import datetime
 from io import BytesIO
-from typing import Optional, Dict, Any, Iterator, TYPE_CHECKING, Union, IO
+from typing import Optional, Dict, Any, Iterator, TYPE_CHECKING, Union, IO, List
 from typing_extensions import Literal
 from urllib.parse import urljoin
 
@@ -114,6 +114,7 @@ class S3Bucket:
     """
     this class represents a single S3 Bucket
     """
+    MAX_DELETE_KEYS = 1000  # the maximum number of keys s3 accepts in a single 'delete_objects' request
 
     @staticmethod
     def create_bucket(s3_resource: 'S3ServiceResource',
@@ -356,6 +357,32 @@ class S3Bucket:
                 raise S3BucketException(
                     f'Error While deleting object in key "{key}": {code}') from ex
 
+    def delete_objects(self, keys: List[str]) -> Dict[str, S3BucketException]:
+        """
+        deletes multiple binaries from the bucket, with as few requests as possible
+
+        :param keys: the keys of the binaries
+        :return: a dict from the key of every binary that wasn't deleted, to the error
+        """
+        errors: Dict[str, S3BucketException] = {}
+        for i in range(0, len(keys), self.MAX_DELETE_KEYS):
+            chunk = keys[i:i + self.MAX_DELETE_KEYS]
+            try:
+                response = self._s3bucket.delete_objects(Delete={'Objects': [{'Key': key} for key in chunk],
+                                                                 'Quiet': True})
+            except ClientError as ex:
+                code = ''
+                if 'Error' in ex.response:
+                    code = ex.response['Error'].get('Code', '')
+                for key in chunk:
+                    errors[key] = S3BucketException(f'Error While deleting object in key "{key}": {code}')
+                continue
+            for error in response.get('Errors', []):
+                key = error.get('Key', '')
+                errors[key] = S3BucketException(f'Error While deleting object in key "{key}": {error.get("Code", "")}')
+
+        return errors
+
     def list_objects(self) -> Iterator[S3Object]:
         """
         lists all the objects in this bucket
@@ -4,11 +4,11 @@ import socket
 import ssl
 import threading
 from io import BytesIO
-from typing import TYPE_CHECKING, Dict, Optional, Tuple, Union, List, Any
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, Union, List, Any, Set
 
 from messageflux.iodevices.base import InputDevice, InputTransaction, ReadResult, InputDeviceException, Message, \
     InputDeviceManager
-from messageflux.iodevices.base.input_transaction import NULLTransaction
+from messageflux.iodevices.base.input_transaction import NULLTransaction, TransactionState
 from messageflux.iodevices.rabbitmq.rabbitmq_device_manager_base import RabbitMQDeviceManagerBase
 from messageflux.utils import ThreadLocalMember
 
@@ -25,6 +25,10 @@ class RabbitMQInputTransaction(InputTransaction):
     """
     represents a InputTransaction for RabbitMQ
     """
+    __slots__ = '_cancellation_token', '_channel', '_delivery_tag'
+
+    _logger = logging.getLogger(__name__)
+    _device: 'RabbitMQInputDevice'
 
     def __init__(self,
                  cancellation_token: threading.Event,
@@ -42,7 +46,6 @@ class RabbitMQInputTransaction(InputTransaction):
         self._cancellation_token = cancellation_token
         self._channel = channel
         self._delivery_tag = delivery_tag
-        self._logger = logging.getLogger(__name__)
 
     @property
     def channel(self) -> 'BlockingChannel':
@@ -58,6 +61,13 @@ class RabbitMQInputTransaction(InputTransaction):
         """
         return self._delivery_tag
 
+    @property
+    def cancellation_requested(self) -> bool:
+        """
+        was cancellation requested on the token that was given when the item was read
+        """
+        return self._cancellation_token.is_set()
+
     def _commit(self):
         try:
             if self._cancellation_token.is_set():
@@ -68,6 +78,8 @@ class RabbitMQInputTransaction(InputTransaction):
             self._channel.basic_ack(self._delivery_tag)
         except Exception:
             self._logger.warning('commit failed', exc_info=True)
+        finally:
+            self._device._forget_delivery_tags(self._channel, [self._delivery_tag])
 
     def _rollback(self):
         try:
@@ -79,6 +91,8 @@ class RabbitMQInputTransaction(InputTransaction):
             self._channel.basic_nack(self._delivery_tag, requeue=True)
         except Exception:
             self._logger.warning('rollback failed', exc_info=True)
+        finally:
+            self._device._forget_delivery_tags(self._channel, [self._delivery_tag])
 
 
 class RabbitMQInputDevice(InputDevice['RabbitMQInputDeviceManager']):
@@ -137,12 +151,17 @@ class RabbitMQInputDevice(InputDevice['RabbitMQInputDeviceManager']):
         self._prefetch_count = max(1, prefetch_count)
         self._use_consumer = use_consumer
         self._last_consumer_auto_ack: Optional[bool] = None
+        # the delivery tags that were not acked/nacked yet, per channel (used to ack a batch using a single frame)
+        self._unacked_delivery_tags: Dict['BlockingChannel', Set[int]] = {}
 
     def _reconnect_device_manager(self):
         """
         reconnects the RabbitMQ device manager
         """
         try:
+            if self._channel is not None:
+                # the unacked messages are returned to the queue by the broker when the channel is closed
+                self._unacked_delivery_tags.pop(self._channel, None)
             if self._channel is not None and self._channel.is_open:
                 assert self._channel is not None
                 if self._use_consumer:
@@ -227,6 +246,7 @@ class RabbitMQInputDevice(InputDevice['RabbitMQInputDeviceManager']):
         delivery_tag = method_frame.delivery_tag
         assert delivery_tag is not None
         if with_transaction:
+            self._unacked_delivery_tags.setdefault(channel, set()).add(delivery_tag)
             transaction: InputTransaction = RabbitMQInputTransaction(cancellation_token=cancellation_token,
                                                                      device=self,
                                                                      channel=channel,
@@ -285,6 +305,83 @@ class RabbitMQInputDevice(InputDevice['RabbitMQInputDeviceManager']):
 
         return body, header_frame, method_frame
 
+    def _forget_delivery_tags(self, channel: 'BlockingChannel', delivery_tags: List[int]):
+        """
+        removes delivery tags that were acked/nacked from the unacked delivery tags of the channel
+        """
+        unacked_delivery_tags = self._unacked_delivery_tags.get(channel)
+        if unacked_delivery_tags is not None:
+            unacked_delivery_tags.difference_update(delivery_tags)
+
+    def _get_multiple_ack_batches(self, transactions: List[InputTransaction]) -> Tuple[
+        Dict['BlockingChannel', List[RabbitMQInputTransaction]],
+        List[InputTransaction]
+    ]:
+        """
+        splits the transactions into batches (per channel) that can be acked/nacked with a single 'multiple' frame,
+        and the transactions that have to be finished one by one.
+
+        a 'multiple' frame finishes all the unacked deliveries up to its delivery tag on the channel,
+        so a batch is used only if it contains all of them
+        """
+        transactions_by_channel: Dict['BlockingChannel', List[RabbitMQInputTransaction]] = {}
+        single_transactions: List[InputTransaction] = []
+        for transaction in transactions:
+            if isinstance(transaction, RabbitMQInputTransaction) and not transaction.cancellation_requested:
+                transactions_by_channel.setdefault(transaction.channel, []).append(transaction)
+            else:
+                single_transactions.append(transaction)
+
+        batches: Dict['BlockingChannel', List[RabbitMQInputTransaction]] = {}
+        for channel, channel_transactions in transactions_by_channel.items():
+            delivery_tags = {transaction.delivery_tag for transaction in channel_transactions}
+            max_delivery_tag = max(delivery_tags)
+            unacked_delivery_tags = self._unacked_delivery_tags.get(channel, set())
+            if len(channel_transactions) > 1 and all(delivery_tag in delivery_tags
+                                                     for delivery_tag in unacked_delivery_tags
+                                                     if delivery_tag <= max_delivery_tag):
+                batches[channel] = channel_transactions
+            else:
+                single_transactions.extend(channel_transactions)
+
+        return batches, single_transactions
+
+    def commit_batch(self, transactions: List[InputTransaction]) -> None:
+        """
+        commits the transactions, using a single ack frame per channel when possible
+        """
+        batches, single_transactions = self._get_multiple_ack_batches(transactions)
+        for transaction in single_transactions:
+            transaction.commit()
+
+        for channel, batch in batches.items():
+            delivery_tags = [transaction.delivery_tag for transaction in batch]
+            try:
+                channel.basic_ack(max(delivery_tags), multiple=True)
+            except Exception:
+                self._logger.warning('commit failed', exc_info=True)
+            self._forget_delivery_tags(channel, delivery_tags)
+            for transaction in batch:
+                transaction._set_finished(TransactionState.COMMITTED)
+
+    def rollback_batch(self, transactions: List[InputTransaction]) -> None:
+        """
+        rolls back the transactions, using a single nack frame per channel when possible
+        """
+        batches, single_transactions = self._get_multiple_ack_batches(transactions)
+        for transaction in single_transactions:
+            transaction.rollback()
+
+        for channel, batch in batches.items():
+            delivery_tags = [transaction.delivery_tag for transaction in batch]
+            try:
+                channel.basic_nack(max(delivery_tags), multiple=True, requeue=True)
+            except Exception:
+                self._logger.warning('rollback failed', exc_info=True)
+            self._forget_delivery_tags(channel, delivery_tags)
+            for transaction in batch:
+                transaction._set_finished(TransactionState.ROLLEDBACK)
+
     def _read_message(self,
                       cancellation_token: threading.Event,
                       timeout: Optional[float] = None,
@@ -50,6 +50,7 @@ class RabbitMQNoPoisonInputTransactionWrapper(InputTransaction):
     """
     represents a wrapper for InputTransaction for RabbitMQ with poison counter
     """
+    __slots__ = '_inner_transaction', '_poison_counter', '_message_id'
 
     def __init__(self,
                  inner_transaction: InputTransaction,
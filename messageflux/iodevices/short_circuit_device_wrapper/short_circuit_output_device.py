@@ -21,7 +21,7 @@ class ShortCircuitOutputDevice(ShortCircuitDeviceBase, OutputDevice['ShortCircui
     def _send_message(self, message_bundle: MessageBundle):
         self._validate_short_circuit()
         with self._failure_count_context():
-            self._inner_device.send_message(message_bundle.message, message_bundle.device_headers)
+            self._inner_device.send_message_bundle(message_bundle)
 
     def close(self):
         """
@@ -1,7 +1,7 @@
 import logging
 import threading
 from io import BytesIO
-from typing import Optional, Union, TYPE_CHECKING, Dict, List, Any
+from typing import Optional, Union, TYPE_CHECKING, Dict, List, Any, Mapping
 
 from messageflux.iodevices.base import (
     InputDevice,
@@ -11,7 +11,7 @@ from messageflux.iodevices.base import (
     Message,
     InputDeviceManager,
 )
-from messageflux.iodevices.base.input_transaction import NULLTransaction
+from messageflux.iodevices.base.input_transaction import NULLTransaction, TransactionState
 from messageflux.iodevices.sqs.message_attributes import decode_message_attributes
 from messageflux.iodevices.sqs.sqs_manager_base import SQSManagerBase
 
@@ -23,8 +23,10 @@ class SQSInputTransaction(InputTransaction):
     """
     represents a InputTransaction for SQS
     """
+    __slots__ = '_message'
 
     _device: "SQSInputDevice"
+    _logger = logging.getLogger(__name__)
 
     def __init__(self, device: "SQSInputDevice", message: 'SQSMessage'):
         """
@@ -34,7 +36,13 @@ class SQSInputTransaction(InputTransaction):
         """
         super().__init__(device=device)
         self._message = message
-        self._logger = logging.getLogger(__name__)
+
+    @property
+    def receipt_handle(self) -> str:
+        """
+        the receipt handle of the received message
+        """
+        return self._message.receipt_handle
 
     def _commit(self):
         try:
@@ -53,6 +61,7 @@ class SQSInputDevice(InputDevice["SQSInputDeviceManager"]):
     """
     represents an SQS input device
     """
+    _MAX_BATCH_SIZE = 10  # the maximum number of entries in sqs batch requests
 
     def __init__(
             self,
@@ -80,6 +89,7 @@ class SQSInputDevice(InputDevice["SQSInputDeviceManager"]):
         self._max_messages_per_request = min(max_messages_per_request, 10)
         self._queue = self.manager.get_queue(queue_name)
         self._message_cache: List['SQSMessage'] = []
+        self._logger = logging.getLogger(__name__)
 
     def _get_sqs_message(self, timeout: Optional[float]) -> 'Optional[SQSMessage]':
         if not self._message_cache:
@@ -99,6 +109,62 @@ class SQSInputDevice(InputDevice["SQSInputDeviceManager"]):
 
         return self._message_cache.pop(0)
 
+    def _get_sqs_transaction_batches(self, transactions: List[InputTransaction]) -> List[List[SQSInputTransaction]]:
+        """
+        splits the sqs transactions into batches of the maximum size that sqs can handle in a single request.
+        transactions that are not sqs transactions are finished one by one
+        """
+        sqs_transactions: List[SQSInputTransaction] = []
+        for transaction in transactions:
+            if isinstance(transaction, SQSInputTransaction) and not transaction.finished:
+                sqs_transactions.append(transaction)
+        return [sqs_transactions[i:i + self._MAX_BATCH_SIZE]
+                for i in range(0, len(sqs_transactions), self._MAX_BATCH_SIZE)]
+
+    def _log_failed_entries(self, response: Mapping[str, Any], operation: str):
+        for failed_entry in response.get('Failed', []):
+            self._logger.warning(f"{operation} failed: {failed_entry.get('Message')}")
+
+    def commit_batch(self, transactions: List[InputTransaction]) -> None:
+        """
+        commits the transactions, using a single delete request per 10 messages
+        """
+        for transaction in transactions:
+            if not isinstance(transaction, SQSInputTransaction):
+                transaction.commit()
+
+        for batch in self._get_sqs_transaction_batches(transactions):
+            try:
+                response = self._queue.delete_messages(
+                    Entries=[{'Id': str(i), 'ReceiptHandle': transaction.receipt_handle}
+                             for i, transaction in enumerate(batch)]
+                )
+                self._log_failed_entries(response, 'commit')
+            except Exception:
+                self._logger.exception("commit failed")
+            for transaction in batch:
+                transaction._set_finished(TransactionState.COMMITTED)
+
+    def rollback_batch(self, transactions: List[InputTransaction]) -> None:
+        """
+        rolls back the transactions, using a single change visibility request per 10 messages
+        """
+        for transaction in transactions:
+            if not isinstance(transaction, SQSInputTransaction):
+                transaction.rollback()
+
+        for batch in self._get_sqs_transaction_batches(transactions):
+            try:
+                response = self._queue.change_message_visibility_batch(
+                    Entries=[{'Id': str(i), 'ReceiptHandle': transaction.receipt_handle, 'VisibilityTimeout': 0}
+                             for i, transaction in enumerate(batch)]
+                )
+                self._log_failed_entries(response, 'rollback')
+            except Exception:
+                self._logger.warning("rollback failed", exc_info=True)
+            for transaction in batch:
+                transaction._set_finished(TransactionState.ROLLEDBACK)
+
     def _read_message(
             self,
             cancellation_token: threading.Event,
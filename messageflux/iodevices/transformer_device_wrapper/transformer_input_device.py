@@ -1,6 +1,6 @@
 import threading
 from abc import ABCMeta, abstractmethod
-from typing import Optional
+from typing import Optional, Callable
 
 from messageflux.iodevices.base import InputDevice, ReadResult, InputDeviceManager
 
@@ -71,6 +71,24 @@ class TransformerInputDevice(InputDevice['TransformerInputDeviceManager']):
 
         return read_result
 
+    def fileno(self) -> Optional[int]:
+        """
+        returns the file descriptor of the inner device
+        """
+        return self._inner_device.fileno()
+
+    def register_ready_callback(self, callback: Callable[[], None]) -> bool:
+        """
+        registers the ready callback on the inner device
+        """
+        return self._inner_device.register_ready_callback(callback)
+
+    def unregister_ready_callback(self, callback: Callable[[], None]) -> None:
+        """
+        unregisters the ready callback from the inner device
+        """
+        self._inner_device.unregister_ready_callback(callback)
+
     def close(self):
         """
         closes the inner device
@@ -58,7 +58,7 @@ class TransformerOutputDevice(OutputDevice['TransformerOutputDeviceManager']):
 
     def _send_message(self, message_bundle: MessageBundle):
         message_bundle = self._transformer.transform_outgoing_message(self, message_bundle)
-        self._inner_device.send_message(message_bundle.message, message_bundle.device_headers)
+        self._inner_device.send_message_bundle(message_bundle)
 
     def close(self):
         """
@@ -64,31 +64,47 @@ class MessageHandlingServiceBase(ServerLoopService, metaclass=ABCMeta):
                 assert last_read_device is not None
                 batch.append((last_read_device, read_result))
 
-            end_time = time() + self._read_timeout
-            for i in range(self._max_batch_read_count - 1):  # try to read the rest of the batch
-                remaining_time = end_time - time()
-
-                if remaining_time <= 0:
-                    break
-
-                if self._wait_for_batch_count:
-                    timeout = remaining_time  # if wait_for_batch_count, try to read another message with remaining time
-                else:
-                    timeout = 0  # if not wait_for_batch, try to read another message without waiting at all
-
-                read_result = transaction_scope.read_message(cancellation_token=cancellation_token,
-                                                             timeout=timeout)
-                if read_result is None:
-                    break  # no more messages to read
-                last_read_device = self._aggregate_input_device.last_read_device
-                assert last_read_device is not None
-                batch.append((last_read_device, read_result))
+            if self._max_batch_read_count > 1:  # no need to compute the batch deadline for single reads
+                self._read_rest_of_batch(transaction_scope, cancellation_token, batch)
 
             if batch:
                 self._handle_message_batch(batch)
 
             transaction_scope.commit()
 
+    def _read_rest_of_batch(self,
+                            transaction_scope: InputTransactionScope,
+                            cancellation_token: threading.Event,
+                            batch: List[Tuple[InputDevice, ReadResult]]):
+        """
+        tries to read the rest of the batch (after the first message was read)
+        """
+        aggregate_input_device = self._aggregate_input_device
+        assert aggregate_input_device is not None
+        if not self._wait_for_batch_count:
+            # read the messages that are already available on the devices, without waiting at all
+            read_results = transaction_scope.read_messages(cancellation_token=cancellation_token,
+                                                           timeout=0,
+                                                           max_batch=self._max_batch_read_count - 1)
+            batch.extend(zip(aggregate_input_device.last_read_devices, read_results))
+            return
+
+        end_time = time() + self._read_timeout
+        for i in range(self._max_batch_read_count - 1):  # try to read the rest of the batch
+            remaining_time = end_time - time()
+
+            if remaining_time <= 0:
+                break
+
+            # try to read another message with remaining time
+            read_result = transaction_scope.read_message(cancellation_token=cancellation_token,
+                                                         timeout=remaining_time)
+            if read_result is None:
+                break  # no more messages to read
+            last_read_device = aggregate_input_device.last_read_device
+            assert last_read_device is not None
+            batch.append((last_read_device, read_result))
+
     def _finalize_service(self, exception: Optional[Exception] = None):
         self._input_device_manager.disconnect()
 
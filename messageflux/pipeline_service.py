@@ -13,6 +13,7 @@ class PipelineResult:
     """
     a result from pipeline handler
     """
+    __slots__ = 'output_device_name', 'message_bundle'
 
     def __init__(self,
                  output_device_name: str,
@@ -106,6 +107,7 @@ class PipelineService(MessageHandlingServiceBase):
                          **kwargs)
         self._output_device_manager = output_device_manager
         self._pipeline_handler = pipeline_handler
+        self._no_output_warning_logged = False
 
     def _prepare_service(self):
         super()._prepare_service()
@@ -114,21 +116,24 @@ class PipelineService(MessageHandlingServiceBase):
         self._pipeline_handler.prepare()
 
     def _handle_message_batch(self, batch: List[Tuple[InputDevice, ReadResult]]):
+        output_device_manager = self._output_device_manager
         for input_device, read_result in batch:
             pipeline_handler_result = self._pipeline_handler.handle_message(input_device, read_result)
-            if pipeline_handler_result is not None:
-                if isinstance(pipeline_handler_result, PipelineResult):
-                    pipeline_handler_result = [pipeline_handler_result]
-                for pipeline_result in pipeline_handler_result:
-                    if self._output_device_manager is None:
-                        _logger.warning("pipeline handler returned a result to output to device: "
-                                        f"'{pipeline_result.output_device_name}', "
-                                        f"but no output_device_manager was given")
-                        continue
-
-                    output_device = self._output_device_manager.get_output_device(pipeline_result.output_device_name)
-                    output_device.send_message(message=pipeline_result.message_bundle.message,
-                                               device_headers=pipeline_result.message_bundle.device_headers)
+            if pipeline_handler_result is None:
+                continue
+
+            if output_device_manager is None:
+                if not self._no_output_warning_logged:
+                    self._no_output_warning_logged = True
+                    _logger.warning("pipeline handler returned a result, but no output_device_manager was given. "
+                                    "the results are discarded (this warning is logged only once)")
+                continue
+
+            if isinstance(pipeline_handler_result, PipelineResult):
+                pipeline_handler_result = [pipeline_handler_result]
+            for pipeline_result in pipeline_handler_result:
+                output_device = output_device_manager.get_output_device(pipeline_result.output_device_name)
+                output_device.send_message_bundle(pipeline_result.message_bundle)
 
     def _finalize_service(self, exception: Optional[Exception] = None):
         try:
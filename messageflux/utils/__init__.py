@@ -1,10 +1,18 @@
 import datetime
+import json
+import math
 import os
 import threading
+from enum import Enum
 from itertools import cycle, islice
 from time import perf_counter
 from typing import Collection, TypeVar, List, Iterator, Generic, Callable, Optional, Any, Union
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
 EllipsisType = type(...)
 
 
@@ -177,11 +185,37 @@ class ThreadLocalMember(Generic[TValueType]):
         lv.value = value
 
 
+_RANDOM_ID_SIZE = 16
+_RANDOM_IDS_PER_FETCH = 64  # the number of random ids that are fetched with a single urandom call
+_random_ids: Iterator[str] = iter(())
+
+
+def _reset_random_ids():
+    """
+    drops the random ids that were fetched by the parent process (so that a forked child doesn't repeat them)
+    """
+    global _random_ids
+    _random_ids = iter(())
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_random_ids)
+
+
 def get_random_id() -> str:
     """
     generates a random 16 bytes hex string
     """
-    return os.urandom(16).hex()
+    global _random_ids
+    # the ids are taken from a list iterator, which is thread safe (concurrent refills just waste some ids)
+    random_id = next(_random_ids, None)
+    if random_id is None:
+        random_hex = os.urandom(_RANDOM_ID_SIZE * _RANDOM_IDS_PER_FETCH).hex()
+        id_length = _RANDOM_ID_SIZE * 2
+        random_ids = iter([random_hex[i:i + id_length] for i in range(0, len(random_hex), id_length)])
+        random_id = next(random_ids)
+        _random_ids = random_ids
+    return random_id
 
 
 class ContextDidNotEndException(KwargsException):
@@ -241,3 +275,66 @@ def json_safe_encoder(obj: Any):
             return str(obj)
     except Exception:
         return "UNENCODABLE"
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+_ORJSON_SAFE_TYPES = frozenset((str, int, bool, type(None)))
+
+
+def _is_orjson_compatible(obj: Any) -> bool:
+    """
+    checks if orjson serializes the object the same way that json does.
+    orjson serializes enums by their value, and non finite floats as null (json uses the default and NaN/Infinity)
+
+    :param obj: the object to check
+    :return: True if orjson can be used to serialize the object
+    """
+    obj_type = type(obj)
+    if obj_type in _ORJSON_SAFE_TYPES:
+        return True
+    if isinstance(obj, dict):  # subclasses too (i.e OrderedDict), since orjson serializes them natively
+        return all(_is_orjson_compatible(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return all(_is_orjson_compatible(item) for item in obj)
+    if isinstance(obj, float):
+        return math.isfinite(obj)
+    if isinstance(obj, Enum):
+        return isinstance(obj, (str, int))  # mixed in enums are serialized by json as their (str/int) value
+    return True  # other types are serialized by orjson natively the same way, or passed to 'default'
+
+
+def json_dumps_bytes(obj: Any, default: Callable[[Any], Any] = json_safe_encoder) -> bytes:
+    """
+    serializes the object to json bytes.
+    uses orjson if it's installed, and falls back to json for objects that orjson can't serialize
+    (or would serialize differently than json)
+
+    :param obj: the object to serialize
+    :param default: a function that converts non-serializable objects to serializable ones
+    :return: the utf-8 encoded json bytes
+    """
+    if orjson is not None and _is_orjson_compatible(obj):
+        try:
+            return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+    return json.dumps(obj, default=default).encode()
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """
+    deserializes json bytes (or str).
+    uses orjson if it's installed, and falls back to json for documents that orjson can't parse
+    (i.e NaN/Infinity, or integers bigger than 64 bit)
+
+    :param data: the json document
+    :return: the deserialized object
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
@@ -1,11 +1,17 @@
+import ctypes
 import os
+import select
 import shutil
+import sys
 
 import errno
 import time
+from typing import Optional
 
 from messageflux.utils import KwargsException
 
+_O_NOATIME = getattr(os, 'O_NOATIME', 0)
+
 MAX_LOCKFILE_AGE = 60  # max lockfile age in seconds
 
 
@@ -67,6 +73,41 @@ def atomic_move(src: str, dest: str, lock_filename: str) -> bool:
                 pass
 
 
+def fsync_dir(dir_name: str):
+    """
+    flushes the directory entries of a folder to disk (i.e to persist the renames and removals in it).
+    does nothing where directories can't be opened (i.e on windows)
+
+    :param dir_name: the folder to flush
+    """
+    try:
+        fd = os.open(dir_name, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_file_bytes(path: str) -> bytes:
+    """
+    reads the whole file with a single (unbuffered) read, without updating its access time (where possible).
+    parsing the content from memory afterwards (i.e with BytesIO) saves the many small reads a parser would do
+
+    :param path: the path of the file to read
+    :return: the content of the file
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY | _O_NOATIME)
+    except PermissionError:  # O_NOATIME is only allowed to the owner of the file
+        fd = os.open(path, os.O_RDONLY)
+    with open(fd, 'rb', buffering=0) as f:
+        return f.readall()
+
+
 def recursive_chmod(dir_name: str):
     """
     chmods to 0o777 the directory and its directory tree
@@ -85,3 +126,73 @@ def recursive_chmod(dir_name: str):
                 os.chmod(os.path.join(root, f), 0o777)
             except OSError:
                 pass
+
+
+class DirectoryWatcher:
+    """
+    watches a directory for new files (using inotify), so that readers can wait for files instead of polling.
+    only supported on linux (use 'DirectoryWatcher.create' which returns None where inotify is not available)
+    """
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_TO = 0x00000080
+    _READ_SIZE = 64 * 1024
+
+    def __init__(self, path: str):
+        """
+        :param path: the directory to watch
+        """
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        if libc.inotify_add_watch(self._fd, os.fsencode(path), self._IN_CLOSE_WRITE | self._IN_MOVED_TO) < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, os.strerror(err), path)
+
+    @classmethod
+    def create(cls, path: str) -> Optional['DirectoryWatcher']:
+        """
+        creates a watcher for the directory
+
+        :param path: the directory to watch
+        :return: the watcher, or None if inotify is not available (i.e not on linux, or out of inotify watches)
+        """
+        if sys.platform != 'linux':
+            return None
+        try:
+            return cls(path)
+        except (OSError, AttributeError):
+            return None
+
+    def fileno(self) -> int:
+        """
+        :return: the inotify file descriptor (readable when there are new files)
+        """
+        return self._fd
+
+    def wait(self, timeout: float) -> bool:
+        """
+        waits for new files in the directory, and drains the pending events
+
+        :param timeout: the maximum time (in seconds) to wait
+        :return: True if new files were written/moved into the directory, False if the timeout has passed
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            while os.read(self._fd, self._READ_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        """
+        closes the watcher
+        """
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
@@ -0,0 +1,83 @@
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+import pytest
+
+from messageflux.iodevices.base import Message
+from messageflux.iodevices.base.input_devices import AggregatedInputDevice
+from .mocks import MockSocketInputDevice, MockErrorDeviceManager, MockPollingInputDevice
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='epoll is only available on linux')
+def test_aggregate_file_descriptors():
+    socket_pairs = [socket.socketpair() for _ in range(2)]
+    inner_devices = [MockSocketInputDevice(f'device{i}', reader) for i, (reader, _) in enumerate(socket_pairs)]
+    aggregate_device = AggregatedInputDevice(MockErrorDeviceManager(), inner_devices)
+    aggregate_device._SLEEP_BETWEEN_ITERATIONS = 30  # the read should be woken by the socket, not by polling
+    try:
+        with ThreadPoolExecutor(1) as executor:
+            future = executor.submit(aggregate_device.read_message,
+                                     cancellation_token=Event(),
+                                     timeout=30,
+                                     with_transaction=False)
+            time.sleep(0.2)
+            start_time = time.perf_counter()
+            socket_pairs[1][1].sendall(b'data')
+            read_result = future.result()
+            elapsed = time.perf_counter() - start_time
+
+        assert read_result is not None
+        assert read_result.message.bytes == b'data'
+        assert aggregate_device.last_read_device is inner_devices[1]
+        assert elapsed < 5
+    finally:
+        aggregate_device.close()
+        for reader, writer in socket_pairs:
+            reader.close()
+            writer.close()
+
+
+def test_aggregate_idle_backoff():
+    inner_devices = [MockPollingInputDevice('device1'), MockPollingInputDevice('device2')]
+    aggregate_device = AggregatedInputDevice(MockErrorDeviceManager(), inner_devices)
+    aggregate_device._SLEEP_BETWEEN_ITERATIONS = 30  # the first sleeps are much shorter than that
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(aggregate_device.read_message,
+                                 cancellation_token=Event(),
+                                 timeout=60,
+                                 with_transaction=False)
+        time.sleep(0.2)
+        start_time = time.perf_counter()
+        inner_devices[1].messages.append(Message(b'data'))
+        read_result = future.result()
+        elapsed = time.perf_counter() - start_time
+
+    assert read_result is not None
+    assert read_result.message.bytes == b'data'
+    assert elapsed < 5
+    assert aggregate_device._idle_sleep_time == aggregate_device._MIN_SLEEP_BETWEEN_ITERATIONS
+
+
+def test_aggregate_idle_does_not_spin():
+    inner_devices = [MockPollingInputDevice('device1'), MockPollingInputDevice('device2')]
+    aggregate_device = AggregatedInputDevice(MockErrorDeviceManager(), inner_devices)
+
+    start_time = time.perf_counter()
+    assert aggregate_device.read_message(cancellation_token=Event(), timeout=0.5, with_transaction=False) is None
+    assert time.perf_counter() - start_time >= 0.5
+
+    # every empty pass is followed by a wait (1ms, doubled up to 100ms), so the devices are read only a few times
+    assert all(inner_device.read_count < 30 for inner_device in inner_devices)
+
+    cancellation_token = Event()
+    cancellation_token.set()
+    assert aggregate_device.read_message(cancellation_token=cancellation_token, timeout=None) is None
+
+
+def test_aggregate_no_devices():
+    aggregate_device = AggregatedInputDevice(manager=MockErrorDeviceManager(), inner_devices=[])
+    assert aggregate_device.read_message(cancellation_token=Event(), timeout=0.3) is None
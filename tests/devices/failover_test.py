@@ -1,3 +1,5 @@
+import logging
+import time
 from io import BytesIO
 
 from messageflux.iodevices.base import OutputDeviceException, Message
@@ -42,3 +44,61 @@ def test_fail():
     except OutputDeviceException:
         assert mockdevice.sent is False
         assert failover_device.sent is False
+
+
+def test_primary_bypass():
+    mockdevice = MockErrorOutputDevice('mock')
+    mockdevice.should_fail = True
+    failover_device = MockErrorOutputDevice('failover')
+    failover_device.should_fail = False
+    food = FailoverOutputDevice(None, mockdevice, failover_device)
+    food._MAX_CONSECUTIVE_PRIMARY_FAILURES = 3
+    food._PRIMARY_BYPASS_INTERVAL = 0.2
+
+    for _ in range(5):
+        food.send_message(Message(b'data'))
+    assert mockdevice.send_attempts == 3
+    assert failover_device.send_attempts == 5
+
+    time.sleep(0.3)
+    mockdevice.should_fail = False
+    food.send_message(Message(b'data'))
+    assert mockdevice.send_attempts == 4
+    assert mockdevice.sent is True
+
+
+def test_repeated_failures_logged_once(caplog):
+    mockdevice = MockErrorOutputDevice('mock')
+    mockdevice.should_fail = True
+    failover_device = MockErrorOutputDevice('failover')
+    failover_device.should_fail = False
+    food = FailoverOutputDevice(None, mockdevice, failover_device)
+
+    with caplog.at_level(logging.WARNING):
+        for _ in range(3):
+            food.send_message(Message(b'data'))
+    assert len([record for record in caplog.records if record.exc_info]) == 1
+
+    mockdevice.should_fail = False
+    food.send_message(Message(b'data'))
+    mockdevice.should_fail = True
+    with caplog.at_level(logging.WARNING):
+        food.send_message(Message(b'data'))
+    assert len([record for record in caplog.records if record.exc_info]) == 2
+
+
+def test_failover_doesnt_share_headers():
+    class _HeaderAddingOutputDevice(MockErrorOutputDevice):
+        def _send_message(self, message_bundle):
+            message_bundle.message.headers['added'] = True
+            super()._send_message(message_bundle)
+
+    mockdevice = MockErrorOutputDevice('mock')
+    mockdevice.should_fail = True
+    failover_device = _HeaderAddingOutputDevice('failover')
+    failover_device.should_fail = False
+    food = FailoverOutputDevice(None, mockdevice, failover_device)
+    message = Message(b'data', {'key': 'value'})
+    food.send_message(message)
+    assert failover_device.sent is True
+    assert message.headers == {'key': 'value'}
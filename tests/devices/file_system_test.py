@@ -1,14 +1,23 @@
 import os
+import shutil
+import sys
+import time
+import zipfile
 from io import BytesIO
-from threading import Event
+from threading import Event, Thread
 from uuid import uuid4
 
+import pytest
+
 from messageflux.iodevices.base import InputTransactionScope, Message
+from messageflux.iodevices.base.input_transaction import TransactionState
 from messageflux.iodevices.file_system import FileSystemInputDeviceManager, FileSystemOutputDeviceManager, \
     NoHeadersFileSystemSerializer, DefaultFileSystemSerializer
 from messageflux.iodevices.file_system.file_system_device_manager_base import FileSystemDeviceManagerBase
-from messageflux.iodevices.file_system.file_system_input_device import TransactionLog
+from messageflux.iodevices.file_system.file_system_input_device import TransactionLog, FileSystemInputDevice, \
+    FileSystemInputTransaction, _PoisonCounts
 from messageflux.iodevices.file_system.file_system_serializer import ZIPFileSystemSerializer, ConcatFileSystemSerializer
+from messageflux.utils.filesystem import DirectoryWatcher
 from tests.devices.common import sanity_test, rollback_test
 
 QUEUE_NAME = "Test"
@@ -24,6 +33,19 @@ def test_folder_creation(tmpdir):
     assert QUEUE_NAME in os.listdir(manager.queues_folder)
 
 
+def test_available_device_names(tmpdir):
+    tmpdir = str(tmpdir)
+    manager = FileSystemInputDeviceManager(tmpdir)
+    with manager:
+        _ = manager.get_input_device(QUEUE_NAME)
+    with open(os.path.join(manager.queues_folder, 'not_a_queue.txt'), 'wb'):
+        pass
+    assert manager.get_available_device_names() == [QUEUE_NAME]
+
+    manager = FileSystemInputDeviceManager(tmpdir, queue_names_are_dirs=True)
+    assert sorted(manager.get_available_device_names()) == sorted([QUEUE_NAME, 'not_a_queue.txt'])
+
+
 def test_generic_sanity(tmpdir):
     input_manager = FileSystemInputDeviceManager(tmpdir)
     output_manager = FileSystemOutputDeviceManager(tmpdir)
@@ -61,6 +83,54 @@ def test_sanity(tmpdir):
     assert len(os.listdir(os.path.join(input_manager.queues_folder, OUTPUT_NAME))) == 1
 
 
+def test_read_headers(tmpdir):
+    tmpdir = str(tmpdir)
+    serializer = NoHeadersFileSystemSerializer()
+    for fifo in (True, False):
+        input_manager = FileSystemInputDeviceManager(tmpdir, serializer=serializer, fifo=fifo)
+        queue_folder = os.path.join(input_manager.queues_folder, QUEUE_NAME)
+        os.makedirs(os.path.join(queue_folder, 'POISON'), exist_ok=True)
+        input_file = os.path.join(queue_folder, 'test_input_file.txt')
+        with open(input_file, 'wb') as f:
+            f.write(b'data')
+        input_file_stat = os.stat(input_file)
+
+        with input_manager:
+            input_device = input_manager.get_input_device(QUEUE_NAME)
+            read_result = input_device.read_message(cancellation_token=Event(), timeout=1, with_transaction=False)
+            assert read_result is not None
+            assert read_result.message.bytes == b'data'
+            assert read_result.device_headers[input_device.FILENAME_HEADER_NAME] == 'test_input_file.txt'
+            assert read_result.device_headers[input_device.STAT_HEADER_NAME].st_ino == input_file_stat.st_ino
+            assert input_device.read_message(cancellation_token=Event(), timeout=0, with_transaction=False) is None
+
+
+def test_fifo_order(tmpdir):
+    tmpdir = str(tmpdir)
+    serializer = NoHeadersFileSystemSerializer()
+    input_manager = FileSystemInputDeviceManager(tmpdir, serializer=serializer)
+    queue_folder = os.path.join(input_manager.queues_folder, QUEUE_NAME)
+    os.makedirs(queue_folder)
+    file_count = FileSystemInputDevice._MIN_BATCH_SIZE * 3
+    now = time.time()
+    for i in reversed(range(file_count)):
+        input_file = os.path.join(queue_folder, f'file_{i}')
+        with open(input_file, 'wb') as f:
+            f.write(str(i).encode())
+        os.utime(input_file, (now - file_count + i, now - file_count + i))
+
+    with input_manager:
+        input_device = input_manager.get_input_device(QUEUE_NAME)
+        data = []
+        for _ in range(file_count):
+            read_result = input_device.read_message(cancellation_token=Event(), timeout=0, with_transaction=False)
+            assert read_result is not None
+            data.append(int(read_result.message.bytes))
+        assert input_device.read_message(cancellation_token=Event(), timeout=0, with_transaction=False) is None
+
+    assert data == list(range(file_count))
+
+
 def test_sanity_unsorted(tmpdir):
     tmpdir = str(tmpdir)
     input_manager = FileSystemInputDeviceManager(tmpdir, fifo=False)
@@ -102,9 +172,11 @@ def test_rollback(tmpdir):
             with InputTransactionScope(input_device) as transaction_scope:
                 _ = transaction_scope.read_message(cancellation_token=cancellation_token)
                 _ = transaction_scope.read_message(cancellation_token=cancellation_token)
-                assert len(os.listdir(input_manager.bookkeeping_folder)) == 1
-                tran_log = TransactionLog._load_file(
-                    os.path.join(input_manager.bookkeeping_folder, os.listdir(input_manager.bookkeeping_folder)[0]))
+                input_manager.transaction_log.write_log()  # the log is usually written by the transaction log thread
+                log_files = [filename for filename in os.listdir(input_manager.bookkeeping_folder)
+                             if filename.endswith('.transactionlog')]
+                assert len(log_files) == 1
+                tran_log = TransactionLog._load_file(os.path.join(input_manager.bookkeeping_folder, log_files[0]))
                 assert len(tran_log) == 2
                 raise Exception()
     except Exception:
@@ -170,3 +242,194 @@ def test_concat_serializer():
     output_message = serializer.deserialize(stream)
 
     assert input_message == output_message
+
+
+def test_transaction_log_written_by_thread(tmpdir):
+    tmpdir = str(tmpdir)
+    input_manager = FileSystemInputDeviceManager(tmpdir, serializer=NoHeadersFileSystemSerializer())
+    os.makedirs(os.path.join(input_manager.queues_folder, QUEUE_NAME))
+    with open(os.path.join(input_manager.queues_folder, QUEUE_NAME, 'test_input_file.txt'), 'wb') as f:
+        f.write(b'data')
+
+    with input_manager:
+        input_device = input_manager.get_input_device(QUEUE_NAME)
+        read_result = input_device.read_message(cancellation_token=Event(), timeout=1)
+        assert read_result is not None
+
+        transaction_log_file = input_manager.transaction_log.filepath
+        for _ in range(50):
+            if os.path.exists(transaction_log_file):
+                break
+            time.sleep(0.1)
+        assert len(TransactionLog._load_file(transaction_log_file)) == 1
+
+        read_result.commit()
+        for _ in range(50):
+            if not os.path.exists(transaction_log_file):
+                break
+            time.sleep(0.1)
+        assert not os.path.exists(transaction_log_file)
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='inotify is only available on linux')
+def test_new_file_wakes_reader(tmpdir):
+    tmpdir = str(tmpdir)
+    serializer = NoHeadersFileSystemSerializer()
+    input_manager = FileSystemInputDeviceManager(tmpdir, serializer=serializer)
+    FileSystemInputDevice._SLEEP_BETWEEN_BATCHES = 10
+    try:
+        with input_manager:
+            input_device = input_manager.get_input_device(QUEUE_NAME)
+            input_file = os.path.join(input_manager.queues_folder, QUEUE_NAME, 'test_input_file.txt')
+
+            def _write_file():
+                time.sleep(0.5)
+                with open(input_file, 'wb') as f:
+                    f.write(b'data')
+
+            writer = Thread(target=_write_file)
+            writer.start()
+            start_time = time.perf_counter()
+            read_result = input_device.read_message(cancellation_token=Event(), timeout=5, with_transaction=False)
+            writer.join()
+            assert read_result is not None
+            assert read_result.message.bytes == b'data'
+            assert time.perf_counter() - start_time < 5
+            input_device.close()
+    finally:
+        FileSystemInputDevice._SLEEP_BETWEEN_BATCHES = 1
+
+
+def test_poison_counts_bounded():
+    poison_counts = _PoisonCounts()
+    poison_counts._MAX_ENTRIES = 2
+    assert poison_counts.increment('a') == 1
+    assert poison_counts.increment('b') == 1
+    assert poison_counts.increment('a') == 2
+    assert poison_counts.increment('c') == 1  # evicts 'b', which is the least recently rolled back
+    assert poison_counts.increment('a') == 3
+    assert poison_counts.increment('b') == 1
+    poison_counts.pop('a')
+    assert poison_counts.increment('a') == 1
+
+
+def test_commit_batch(tmpdir):
+    tmpdir = str(tmpdir)
+    input_manager = FileSystemInputDeviceManager(tmpdir, serializer=NoHeadersFileSystemSerializer())
+    os.makedirs(os.path.join(input_manager.queues_folder, QUEUE_NAME))
+    for i in range(3):
+        with open(os.path.join(input_manager.queues_folder, QUEUE_NAME, f'test_input_file{i}.txt'), 'wb') as f:
+            f.write(b'data')
+
+    with input_manager:
+        input_device = input_manager.get_input_device(QUEUE_NAME)
+        read_results = input_device.read_messages(cancellation_token=Event(), timeout=1, max_batch=3)
+        assert len(read_results) == 3
+        assert len(os.listdir(input_manager.tmp_folder)) == 3
+        input_device.commit_batch([read_result.transaction for read_result in read_results])
+        assert all(read_result.transaction.state == TransactionState.COMMITTED for read_result in read_results)
+        assert not os.listdir(input_manager.tmp_folder)
+        input_manager.transaction_log.write_log()
+        assert not os.path.exists(input_manager.transaction_log.filepath)
+
+
+def test_poison_folder_recreated(tmpdir):
+    tmpdir = str(tmpdir)
+    queue_folder = os.path.join(tmpdir, QUEUE_NAME)
+    poison_folder = os.path.join(queue_folder, 'POISON')
+    os.makedirs(queue_folder)
+    for _ in range(2):
+        tmp_path = os.path.join(tmpdir, 'tmp_file')
+        with open(tmp_path, 'wb') as f:
+            f.write(b'data')
+        FileSystemInputTransaction.rollback_path(tmp_path=tmp_path,
+                                                 org_path=os.path.join(queue_folder, 'test_input_file.txt'),
+                                                 max_poison_count=1)
+        assert len(os.listdir(poison_folder)) == 1
+        assert not os.path.exists(tmp_path)
+        shutil.rmtree(poison_folder)
+
+
+def test_read_after_queue_folder_replaced(tmpdir):
+    tmpdir = str(tmpdir)
+    input_manager = FileSystemInputDeviceManager(tmpdir, serializer=NoHeadersFileSystemSerializer())
+    queue_folder = os.path.join(input_manager.queues_folder, QUEUE_NAME)
+    with input_manager:
+        input_device = input_manager.get_input_device(QUEUE_NAME)
+        for i in range(2):
+            with open(os.path.join(queue_folder, 'test_input_file.txt'), 'wb') as f:
+                f.write(b'data')
+            read_result = input_device.read_message(cancellation_token=Event(), timeout=1, with_transaction=False)
+            assert read_result is not None
+            assert read_result.message.bytes == b'data'
+            shutil.rmtree(queue_folder)  # the device holds a file descriptor of the old folder
+            os.makedirs(queue_folder)
+        input_device.close()
+
+
+def test_rollback_wakes_reader_without_inotify(tmpdir, monkeypatch):
+    monkeypatch.setattr(DirectoryWatcher, 'create', classmethod(lambda cls, path: None))
+    monkeypatch.setattr(FileSystemInputDevice, '_SLEEP_BETWEEN_BATCHES', 10)
+    tmpdir = str(tmpdir)
+    input_manager = FileSystemInputDeviceManager(tmpdir, serializer=NoHeadersFileSystemSerializer())
+    os.makedirs(os.path.join(input_manager.queues_folder, QUEUE_NAME))
+    with open(os.path.join(input_manager.queues_folder, QUEUE_NAME, 'test_input_file.txt'), 'wb') as f:
+        f.write(b'data')
+
+    with input_manager:
+        input_device = input_manager.get_input_device(QUEUE_NAME)
+        read_result = input_device.read_message(cancellation_token=Event(), timeout=1)
+        assert read_result is not None
+        read_results = []
+
+        def _read():
+            read_results.append(input_device.read_message(cancellation_token=Event(), timeout=5))
+
+        reader = Thread(target=_read)
+        reader.start()
+        time.sleep(0.5)
+        start_time = time.perf_counter()
+        read_result.rollback()
+        reader.join()
+        assert time.perf_counter() - start_time < 5
+        assert read_results[0] is not None
+        assert read_results[0].message.bytes == b'data'
+        read_results[0].commit()
+
+
+def test_empty_transaction_log_removed_once(tmpdir, monkeypatch):
+    transaction_log = TransactionLog(os.path.join(str(tmpdir), 'test.transactionlog'))
+    removed_paths = []
+    org_remove = os.remove
+
+    def _remove(path, *args, **kwargs):
+        removed_paths.append(path)
+        org_remove(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'remove', _remove)
+    transaction_log.write_log()
+    transaction_log.write_log()
+    assert removed_paths == [transaction_log.filepath]
+
+
+def test_serialize_to():
+    data = uuid4().bytes * 1024
+    input_message = Message(BytesIO(data), headers={'test': 'foo'})
+    for serializer in (ZIPFileSystemSerializer(), ConcatFileSystemSerializer(), NoHeadersFileSystemSerializer()):
+        out = BytesIO()
+        serializer.serialize_to(input_message, out)
+        out.seek(0)
+        output_message = serializer.deserialize(out)
+        assert output_message.bytes == data
+        assert input_message.stream.tell() == 0  # the message can still be used after it was serialized
+        if not isinstance(serializer, NoHeadersFileSystemSerializer):
+            assert output_message.headers == input_message.headers
+
+
+def test_zip_serializer_compression():
+    input_message = Message(b'a' * 10000, headers={'test': 'foo'})
+    stored = ZIPFileSystemSerializer().serialize(input_message).read()
+    deflated_serializer = ZIPFileSystemSerializer(compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+    deflated = deflated_serializer.serialize(input_message).read()
+    assert len(deflated) < len(stored)
+    assert ZIPFileSystemSerializer().deserialize(BytesIO(deflated)) == input_message
@@ -1,5 +1,16 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from threading import Event
+
+import pytest
+
+from messageflux.iodevices.base import Message, InputDeviceException, InputTransactionScope
+from messageflux.iodevices.base.input_devices import AggregatedInputDevice
+from messageflux.iodevices.base.common import MessageBundle
 from messageflux.iodevices.in_memory_device import InMemoryDeviceManager
 from .common import sanity_test, rollback_test
+from .mocks import MockErrorInputDevice, MockException
 
 
 def test_sanity():
@@ -10,3 +21,278 @@ def test_sanity():
 def test_rollback():
     in_memory_device_manager = InMemoryDeviceManager()
     rollback_test(in_memory_device_manager, in_memory_device_manager)
+
+
+def test_send_message_bundle():
+    in_memory_device_manager = InMemoryDeviceManager()
+    output_device = in_memory_device_manager.get_output_device('device1')
+    output_device.send_message_bundle(MessageBundle(Message(b'data', {'key': 'value'})))
+
+    input_device = in_memory_device_manager.get_input_device('device1')
+    read_result = input_device.read_message(cancellation_token=Event(), timeout=0, with_transaction=False)
+    assert read_result is not None
+    assert read_result.message == Message(b'data', {'key': 'value'})
+
+
+def test_output_device_cache():
+    in_memory_device_manager = InMemoryDeviceManager()
+    output_device = in_memory_device_manager.get_output_device('device1')
+    assert in_memory_device_manager.get_output_device('device1') is output_device
+    assert in_memory_device_manager.get_output_device(''.join(['device', '1'])) is output_device
+    assert in_memory_device_manager.get_output_device('device2') is not output_device
+
+    output_device.close()
+    new_output_device = in_memory_device_manager.get_output_device('device1')
+    assert new_output_device is not output_device
+    assert in_memory_device_manager.get_output_device('device1') is new_output_device
+
+
+def test_output_device_cache_deleted_during_lookup():
+    in_memory_device_manager = InMemoryDeviceManager()
+    output_device = in_memory_device_manager.get_output_device('device1')
+    in_memory_device_manager.get_output_device('device2')  # so that device1 is not the last device
+
+    class _DeletingDict(dict):
+        def __getitem__(self, key):
+            value = super().__getitem__(key)
+            in_memory_device_manager.delete_output_device_from_cache(key)  # another thread closes the device
+            return value
+
+    in_memory_device_manager._output_device_cache = _DeletingDict(in_memory_device_manager._output_device_cache)
+    assert in_memory_device_manager.get_output_device('device1') is output_device
+    in_memory_device_manager._output_device_cache = dict(in_memory_device_manager._output_device_cache)
+    assert in_memory_device_manager.get_output_device('device1') is not output_device
+
+
+def test_device_cache_str_enum_names():
+    class QueueName(str, Enum):
+        QUEUE = 'queue'
+
+    in_memory_device_manager = InMemoryDeviceManager()
+    output_device = in_memory_device_manager.get_output_device(QueueName.QUEUE)
+    assert in_memory_device_manager.get_output_device(QueueName.QUEUE) is output_device
+    input_device = in_memory_device_manager.get_input_device(QueueName.QUEUE)
+    assert in_memory_device_manager.get_input_device(QueueName.QUEUE) is input_device
+
+
+def test_output_device_cache_concurrent_creation():
+    class _SlowInMemoryDeviceManager(InMemoryDeviceManager):
+        create_count = 0
+
+        def _create_output_device(self, name):
+            self.create_count += 1
+            time.sleep(0.1)
+            return super()._create_output_device(name)
+
+    in_memory_device_manager = _SlowInMemoryDeviceManager()
+    with ThreadPoolExecutor(4) as executor:
+        output_devices = list(executor.map(in_memory_device_manager.get_output_device, ['device1'] * 4))
+
+    assert in_memory_device_manager.create_count == 1
+    assert all(output_device is output_devices[0] for output_device in output_devices)
+
+
+def test_aggregate_ready_notification():
+    in_memory_device_manager = InMemoryDeviceManager()
+    aggregate_device = in_memory_device_manager.get_aggregate_device(['device1', 'device2'])
+    aggregate_device._SLEEP_BETWEEN_ITERATIONS = 30  # the read should be woken by the device, not by polling
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(aggregate_device.read_message, cancellation_token=Event(), timeout=30)
+        time.sleep(0.2)
+        start_time = time.perf_counter()
+        in_memory_device_manager.get_output_device('device2').send_message(Message(b'data'))
+        read_result = future.result()
+        elapsed = time.perf_counter() - start_time
+
+    assert read_result is not None
+    assert read_result.message.bytes == b'data'
+    assert aggregate_device.last_read_device is not None
+    assert aggregate_device.last_read_device.name == 'device2'
+    assert elapsed < 5
+
+    aggregate_device.close()
+    assert not in_memory_device_manager.get_input_device('device2')._ready_callbacks
+
+
+def test_aggregate_priorities():
+    in_memory_device_manager = InMemoryDeviceManager()
+    in_memory_device_manager.get_output_device('low').send_message(Message(b'low1'))
+    in_memory_device_manager.get_output_device('low').send_message(Message(b'low2'))
+    in_memory_device_manager.get_output_device('high').send_message(Message(b'high1'))
+    in_memory_device_manager.get_output_device('high').send_message(Message(b'high2'))
+
+    aggregate_device = in_memory_device_manager.get_aggregate_device(['low', 'high'], priorities=[1, 10])
+    results = []
+    for _ in range(4):
+        read_result = aggregate_device.read_message(cancellation_token=Event(), timeout=0)
+        assert read_result is not None
+        results.append(read_result.message.bytes)
+    assert results == [b'high1', b'high2', b'low1', b'low2']
+
+    with pytest.raises(InputDeviceException):
+        in_memory_device_manager.get_aggregate_device(['low', 'high'], priorities=[1])
+
+
+def test_aggregate_round_robin():
+    in_memory_device_manager = InMemoryDeviceManager()
+    for device_name in ('device1', 'device2'):
+        for i in range(2):
+            in_memory_device_manager.get_output_device(device_name).send_message(Message(f'{device_name}-{i}'.encode()))
+
+    aggregate_device = in_memory_device_manager.get_aggregate_device(['device1', 'device2'])
+    results = []
+    for _ in range(4):
+        read_result = aggregate_device.read_message(cancellation_token=Event(), timeout=1)
+        assert read_result is not None
+        results.append(read_result.message.bytes)
+    assert results == [b'device1-0', b'device2-0', b'device1-1', b'device2-1']
+    assert aggregate_device.read_message(cancellation_token=Event(), timeout=0) is None
+    assert aggregate_device.last_read_device is None
+
+
+def test_aggregate_read_messages():
+    in_memory_device_manager = InMemoryDeviceManager()
+    for device_name in ('device1', 'device2'):
+        for i in range(3):
+            in_memory_device_manager.get_output_device(device_name).send_message(Message(f'{device_name}-{i}'.encode()))
+
+    aggregate_device = in_memory_device_manager.get_aggregate_device(['device1', 'device2'])
+    read_results = aggregate_device.read_messages(cancellation_token=Event(), timeout=0, max_batch=3)
+    assert [read_result.message.bytes for read_result in read_results] == [b'device1-0', b'device2-0', b'device1-1']
+    assert [device.name for device in aggregate_device.last_read_devices] == ['device1', 'device2', 'device1']
+
+    read_results = aggregate_device.read_messages(cancellation_token=Event(), timeout=0, max_batch=10)
+    assert [read_result.message.bytes for read_result in read_results] == [b'device2-1', b'device1-2', b'device2-2']
+    assert aggregate_device.last_read_device is not None
+    assert aggregate_device.last_read_device.name == 'device2'
+
+    assert aggregate_device.read_messages(cancellation_token=Event(), timeout=0, max_batch=10) == []
+    assert aggregate_device.last_read_devices == []
+
+    priority_device = in_memory_device_manager.get_aggregate_device(['device1', 'device2'], priorities=[1, 10])
+    for device_name in ('device1', 'device2'):
+        for i in range(2):
+            in_memory_device_manager.get_output_device(device_name).send_message(Message(f'{device_name}-{i}'.encode()))
+    read_results = priority_device.read_messages(cancellation_token=Event(), timeout=0, max_batch=10)
+    assert [read_result.message.bytes for read_result in read_results] == [b'device2-0', b'device2-1',
+                                                                           b'device1-0', b'device1-1']
+
+
+def test_aggregate_read_messages_with_failing_device():
+    in_memory_device_manager = InMemoryDeviceManager()
+    for i in range(3):
+        in_memory_device_manager.get_output_device('device1').send_message(Message(f'{i}'.encode()))
+    error_device = MockErrorInputDevice('error')
+    aggregate_device = AggregatedInputDevice(manager=in_memory_device_manager,
+                                             inner_devices=[in_memory_device_manager.get_input_device('device1'),
+                                                            error_device],
+                                             priorities=[10, 1])
+
+    with pytest.raises(MockException):
+        with InputTransactionScope(aggregate_device) as transaction_scope:
+            # the messages that were read before the error device failed are returned
+            read_results = transaction_scope.read_messages(cancellation_token=Event(), timeout=0, max_batch=10)
+            assert [read_result.message.bytes for read_result in read_results] == [b'0', b'1', b'2']
+            transaction_scope.read_messages(cancellation_token=Event(), timeout=0, max_batch=10)
+
+    # the scope rolled back all the messages
+    input_device = in_memory_device_manager.get_input_device('device1')
+    read_results = input_device.read_messages(cancellation_token=Event(), timeout=0, max_batch=10,
+                                              with_transaction=False)
+    assert sorted(read_result.message.bytes for read_result in read_results) == [b'0', b'1', b'2']
+
+
+def test_aggregate_round_robin_with_failing_device():
+    in_memory_device_manager = InMemoryDeviceManager()
+    for device_name in ['good1', 'good2']:
+        for _ in range(5):
+            in_memory_device_manager.get_output_device(device_name).send_message(Message(device_name.encode()))
+    aggregate_device = AggregatedInputDevice(manager=in_memory_device_manager,
+                                             inner_devices=[in_memory_device_manager.get_input_device('good1'),
+                                                            MockErrorInputDevice('bad'),
+                                                            in_memory_device_manager.get_input_device('good2')])
+
+    results = []
+    for _ in range(8):
+        try:
+            read_result = aggregate_device.read_message(cancellation_token=Event(), timeout=0, with_transaction=False)
+            results.append(read_result.message.bytes.decode())
+        except MockException:
+            results.append('EXC')
+
+    # the failing device doesn't block the devices after it
+    assert results == ['good1', 'EXC', 'good2', 'good1', 'EXC', 'good2', 'good1', 'EXC']
+
+    # the same goes for batch reads, which stop at the failing device
+    read_results = aggregate_device.read_messages(cancellation_token=Event(), timeout=0, max_batch=10,
+                                                  with_transaction=False)
+    assert [read_result.message.bytes for read_result in read_results] == [b'good2', b'good1']
+    read_results = aggregate_device.read_messages(cancellation_token=Event(), timeout=0, max_batch=10,
+                                                  with_transaction=False)
+    assert [read_result.message.bytes for read_result in read_results] == [b'good2', b'good1']
+
+
+def test_aggregate_cancellation():
+    in_memory_device_manager = InMemoryDeviceManager()
+    aggregate_device = in_memory_device_manager.get_aggregate_device(['device1', 'device2'])
+    cancellation_token = Event()
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(aggregate_device.read_message, cancellation_token=cancellation_token, timeout=None)
+        time.sleep(0.2)
+        assert not future.done()
+        cancellation_token.set()
+        assert future.result(timeout=5) is None
+
+    in_memory_device_manager.get_output_device('device1').send_message(Message(b'data'))
+    assert aggregate_device.read_message(cancellation_token=cancellation_token, timeout=None) is None
+
+
+def test_aggregate_single_device():
+    in_memory_device_manager = InMemoryDeviceManager()
+    aggregate_device = in_memory_device_manager.get_aggregate_device(['device1'])
+    assert aggregate_device.read_message(cancellation_token=Event(), timeout=0) is None
+    assert aggregate_device.last_read_device is None
+
+    in_memory_device_manager.get_output_device('device1').send_message(Message(b'data'))
+    read_result = aggregate_device.read_message(cancellation_token=Event(), timeout=1)
+    assert read_result is not None
+    assert read_result.message.bytes == b'data'
+    assert read_result.device_headers[aggregate_device.INPUT_DEVICE_NAME_HEADER] == 'device1'
+    assert aggregate_device.last_read_device is in_memory_device_manager.get_input_device('device1')
+
+
+def test_rollback_keeps_send_order():
+    in_memory_device_manager = InMemoryDeviceManager()
+    with in_memory_device_manager:
+        output_device = in_memory_device_manager.get_output_device('test')
+        input_device = in_memory_device_manager.get_input_device('test')
+        for i in range(4):
+            output_device.send_message(Message(str(i).encode()))
+
+        read_results = [input_device.read_message(cancellation_token=Event(), timeout=0) for _ in range(3)]
+        for index in (0, 2, 1):  # rolled back out of order
+            read_results[index].rollback()
+
+        data = [input_device.read_message(cancellation_token=Event(), timeout=0, with_transaction=False).message.bytes
+                for _ in range(4)]
+        assert data == [b'0', b'1', b'2', b'3']
+        assert input_device.read_message(cancellation_token=Event(), timeout=0) is None
+
+
+def test_send_wakes_waiting_reader():
+    in_memory_device_manager = InMemoryDeviceManager()
+    with in_memory_device_manager:
+        output_device = in_memory_device_manager.get_output_device('test')
+        input_device = in_memory_device_manager.get_input_device('test')
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(input_device.read_message, cancellation_token=Event(), timeout=5)
+        time.sleep(0.2)
+        start_time = time.perf_counter()
+        output_device.send_message(Message(b'data'))
+        read_result = future.result()
+        assert time.perf_counter() - start_time < 5
+        assert read_result is not None
+        assert read_result.message.bytes == b'data'
+        executor.shutdown()
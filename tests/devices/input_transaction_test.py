@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+import pytest
+
+from messageflux.iodevices.base import InputTransaction, NULL_TRANSACTION, InputTransactionScope, Message, ReadResult
+from messageflux.iodevices.base.input_devices import _NullDevice
+from messageflux.iodevices.base.input_transaction import TransactionState, WrongTransactionStateException
+from messageflux.iodevices.in_memory_device import InMemoryDeviceManager
+
+
+class _CountingTransaction(InputTransaction):
+    def __init__(self, log=None, name=None):
+        super().__init__(NULL_TRANSACTION.device)
+        self.commit_count = 0
+        self.rollback_count = 0
+        self._log = log
+        self._name = name
+
+    def _commit(self):
+        self.commit_count += 1
+        if self._log is not None:
+            self._log.append(('commit', self._name))
+
+    def _rollback(self):
+        self.rollback_count += 1
+        if self._log is not None:
+            self._log.append(('rollback', self._name))
+
+
+def test_commit_and_rollback():
+    transaction = _CountingTransaction()
+    assert not transaction.finished
+    assert not transaction.wait_for_finish(timeout=0)
+    transaction.commit()
+    transaction.commit()
+    assert transaction.commit_count == 1
+    assert transaction.finished
+    assert transaction.state == TransactionState.COMMITTED
+    with pytest.raises(WrongTransactionStateException):
+        transaction.rollback()
+
+    transaction = _CountingTransaction()
+    with pytest.raises(ValueError):
+        with transaction:
+            raise ValueError()
+    assert transaction.rollback_count == 1
+    assert transaction.state == TransactionState.ROLLEDBACK
+
+
+def test_wait_for_finish():
+    transaction = _CountingTransaction()
+    with ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(transaction.wait_for_finish, 10) for _ in range(2)]
+        time.sleep(0.1)
+        assert not any(future.done() for future in futures)
+        transaction.commit()
+        assert all(future.result(timeout=5) for future in futures)
+
+    assert transaction.wait_for_finish(timeout=0)
+
+
+def test_null_transaction():
+    assert _NullDevice() is NULL_TRANSACTION.device
+    assert _NullDevice().manager is NULL_TRANSACTION.device.manager
+    assert NULL_TRANSACTION.finished
+    assert NULL_TRANSACTION.state == TransactionState.COMMITTED
+    assert NULL_TRANSACTION.wait_for_finish(timeout=0)
+    NULL_TRANSACTION.commit()
+    NULL_TRANSACTION.rollback()  # the shared null transaction never raises
+    with NULL_TRANSACTION:
+        pass
+
+
+def test_transaction_scope_order():
+    log = []
+    device = InMemoryDeviceManager().get_input_device('device')
+    pending = []
+
+    def _read_message(cancellation_token, timeout=None, with_transaction=True):
+        return pending.pop(0) if pending else None
+
+    device._read_message = _read_message
+    for kind in ('commit', 'rollback'):
+        pending.extend(ReadResult(Message(b''), transaction=_CountingTransaction(log, i)) for i in range(3))
+        with InputTransactionScope(device) as transaction_scope:
+            assert len(transaction_scope.read_messages(cancellation_token=Event(), timeout=0, max_batch=3)) == 3
+            if kind == 'rollback':
+                transaction_scope.rollback()
+
+    assert log == [('commit', 0), ('commit', 1), ('commit', 2),
+                   ('rollback', 2), ('rollback', 1), ('rollback', 0)]
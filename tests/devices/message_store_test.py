@@ -1,10 +1,16 @@
 import os
+import posixpath
+from datetime import datetime
 from threading import Event
 
+import pytest
+
 from messageflux.iodevices.base import Message
+from messageflux.iodevices.base.common import MessageBundle
 from messageflux.iodevices.file_system import FileSystemInputDeviceManager, FileSystemOutputDeviceManager
 from messageflux.iodevices.message_store_device_wrapper.file_system_message_store import FileSystemMessageStore
-from messageflux.iodevices.message_store_device_wrapper.message_store_base import MessageStoreBase
+from messageflux.iodevices.message_store_device_wrapper.message_store_base import MessageStoreBase, \
+    MessageStoreException
 from messageflux.iodevices.message_store_device_wrapper.message_store_input_device import \
     MessageStoreInputDeviceManagerWrapper
 from messageflux.iodevices.message_store_device_wrapper.message_store_output_device import \
@@ -206,3 +212,24 @@ def test_threshold(tmpdir):
         output_device.send_message(Message(b'X' * (THRESHOLD - 1)))
 
         assert len(os.listdir(bucket_dir)) == 1  # File Was Not Written
+
+
+def test_delete_messages(tmpdir):
+    msg_store_dir = os.path.join(str(tmpdir), "MSGSTORE")
+    msg_store = FileSystemMessageStore(msg_store_dir, num_of_subdirs=1)
+    with msg_store:
+        keys = [msg_store.put_message(QUEUE_NAME, MessageBundle(Message(b'data'))) for _ in range(5)]
+        msg_store.delete_messages(keys[:3])
+        for key in keys[3:]:
+            assert msg_store.read_message(key).message.bytes == b'data'
+        msg_store.delete_messages(keys[3:])
+        assert not os.listdir(msg_store_dir)
+        with pytest.raises(MessageStoreException):
+            msg_store.delete_messages(keys[:1])
+
+
+def test_relative_path_date(tmpdir):
+    msg_store = FileSystemMessageStore(str(tmpdir), num_of_subdirs=0)
+    subdir = posixpath.dirname(msg_store.generate_relative_path())
+    assert subdir == datetime.now().strftime(FileSystemMessageStore.DATE_FORMAT) + '-0'
+    assert posixpath.dirname(msg_store.generate_relative_path()) == subdir
@@ -0,0 +1,52 @@
+import copy
+from io import BytesIO
+
+from messageflux.iodevices.base import Message
+
+
+def test_message_from_bytes_lazy_stream():
+    message = Message(b'hello world', headers={'a': 1})
+    assert message.bytes == b'hello world'
+
+    stream = message.stream
+    assert stream.read(5) == b'hello'
+    assert message.bytes == b' world'  # bytes reads from the current stream position
+    assert message.stream is stream
+
+    message_copy = message.copy()
+    assert message_copy.bytes == b'hello world'
+    assert message_copy.headers == {'a': 1}
+    assert message_copy.headers is not message.headers
+
+
+def test_message_copy():
+    for data in (b'data', BytesIO(b'data')):
+        message = Message(data, headers={'a': [1]})
+        assert message.copy() == message
+        assert copy.copy(message) == message
+
+        deep_copy = copy.deepcopy(message)
+        assert deep_copy == message
+        assert deep_copy.headers['a'] is not message.headers['a']
+
+        new_headers_copy = message.copy(new_headers={'b': 2})
+        assert new_headers_copy.bytes == b'data'
+        assert new_headers_copy.headers == {'b': 2}
+
+
+def test_message_deepcopy_immutable_headers():
+    headers = {'str': 'a', 'int': 1, 'float': 1.5, 'bool': True, 'bytes': b'b', 'none': None}
+    message = Message(b'data', headers=headers)
+    deep_copy = copy.deepcopy(message)
+    assert deep_copy.headers == headers
+    assert deep_copy.headers is not headers
+
+
+def test_message_copy_rewinds_stream():
+    message = Message(BytesIO(b'hello world'))
+    assert message.stream.read(5) == b'hello'
+
+    message_copy = message.copy()
+    assert message_copy.stream.tell() == 0
+    assert message_copy.bytes == b'hello world'
+    assert message.bytes == b' world'  # the original stream position is kept
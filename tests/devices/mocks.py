@@ -3,7 +3,7 @@ from typing import Optional
 
 from messageflux import InputDevice, ReadResult
 from messageflux.iodevices.base import OutputDevice, InputDeviceManager, OutputDeviceManager
-from messageflux.iodevices.base.common import MessageBundle
+from messageflux.iodevices.base.common import MessageBundle, Message
 
 
 class MockException(Exception):
@@ -34,8 +34,10 @@ class MockErrorOutputDevice(OutputDevice):
 
         self.should_fail = True
         self.sent = False
+        self.send_attempts = 0
 
     def _send_message(self, message_bundle: MessageBundle):
+        self.send_attempts += 1
         if self.should_fail:
             raise MockException
         self.sent = True
@@ -51,3 +53,47 @@ class MockErrorDeviceManager(InputDeviceManager, OutputDeviceManager):
 
     def _create_output_device(self, name):
         return MockErrorOutputDevice(name)
+
+
+class MockSocketInputDevice(InputDevice):
+    """
+    an input device that reads the data that was written to a socket as a message
+    """
+
+    def __init__(self, name, sock):
+        super(MockSocketInputDevice, self).__init__(MockErrorDeviceManager(), name)
+        sock.setblocking(False)
+        self._socket = sock
+
+    def _read_message(self,
+                      cancellation_token: threading.Event,
+                      timeout: Optional[float] = None,
+                      with_transaction: bool = True) -> Optional[ReadResult]:
+        try:
+            data = self._socket.recv(4096)
+        except BlockingIOError:
+            return None
+        return ReadResult(message=Message(data))
+
+    def fileno(self) -> Optional[int]:
+        return self._socket.fileno()
+
+
+class MockPollingInputDevice(InputDevice):
+    """
+    an input device without ready notifications, that returns the messages in 'messages'
+    """
+
+    def __init__(self, name):
+        super(MockPollingInputDevice, self).__init__(MockErrorDeviceManager(), name)
+        self.messages = []
+        self.read_count = 0
+
+    def _read_message(self,
+                      cancellation_token: threading.Event,
+                      timeout: Optional[float] = None,
+                      with_transaction: bool = True) -> Optional[ReadResult]:
+        self.read_count += 1
+        if not self.messages:
+            return None
+        return ReadResult(message=self.messages.pop(0))
@@ -1,3 +1,4 @@
+import json
 from io import BytesIO
 
 import boto3
@@ -82,3 +83,61 @@ def test_headers():
     res_bundle = message_store.read_message(key)
     assert res_bundle.message.headers["SOME_HEADER"] == "some_value1"
     assert res_bundle.message.headers["Some_Header"] == "some_value2"
+
+
+@mock_s3
+def test_s3_delete_messages():
+    s3_resource = boto3.resource('s3')
+    with S3MessageStore(s3_resource,
+                        auto_create_bucket=True) as s3_message_store:
+        keys = [s3_message_store.put_message("device-name", MessageBundle(Message(BytesIO(b"data %d" % i), {})))
+                for i in range(5)]
+
+        s3_message_store.delete_messages(keys)
+
+        for key in keys:
+            with pytest.raises(S3NoSuchItem):
+                s3_message_store.read_message(key)
+
+
+@mock_s3
+def test_s3_message_store_file_stream(tmpdir):
+    path = str(tmpdir.join('payload'))
+    with open(path, 'wb') as f:
+        f.write(b"some data")
+    s3_resource = boto3.resource('s3')
+    with S3MessageStore(s3_resource,
+                        auto_create_bucket=True) as s3_message_store, open(path, 'rb') as f:
+        key = s3_message_store.put_message("device-name", MessageBundle(Message(f)))
+        same_key = s3_message_store.put_message("device-name", MessageBundle(Message(BytesIO(b"some data"))))
+
+        # the key ends with the hash of the content
+        assert s3_message_store.deserialize_key(key)[1].split('.')[-1] == \
+            s3_message_store.deserialize_key(same_key)[1].split('.')[-1]
+        assert s3_message_store.read_message(key).message.bytes == b"some data"
+
+
+@mock_s3
+def test_s3_message_store_non_ascii_headers():
+    headers = {"header key": "ערך", "number": 1}
+    s3_resource = boto3.resource('s3')
+    with S3MessageStore(s3_resource,
+                        auto_create_bucket=True) as s3_message_store:
+        serialized_headers = s3_message_store._serialize_headers(headers)
+        assert all(value.isascii() for value in serialized_headers.values())
+
+        key = s3_message_store.put_message("device-name", MessageBundle(Message(BytesIO(b"some data"), headers)))
+        assert s3_message_store.read_message(key).message.headers == headers
+
+
+@mock_s3
+def test_s3_message_store_json_key():
+    s3_resource = boto3.resource('s3')
+    with S3MessageStore(s3_resource,
+                        auto_create_bucket=True) as s3_message_store:
+        key = s3_message_store.put_message("device-name", MessageBundle(Message(BytesIO(b"some data"))))
+        bucket_name, s3_key = s3_message_store.deserialize_key(key)
+        # the key must stay readable by json (i.e by consumers running older versions)
+        assert json.loads(key) == {'bucket_name': bucket_name, 'key': s3_key}
+        assert s3_message_store.deserialize_key(json.dumps({'bucket_name': bucket_name, 'key': s3_key})) == \
+            (bucket_name, s3_key)
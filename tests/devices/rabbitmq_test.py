@@ -136,6 +136,44 @@ def test_generic_rollback():
             output_manager.delete_queue(queue_name, only_if_empty=False)
 
 
+def test_transaction_scope_batch():
+    input_manager = RabbitMQInputDeviceManager(hosts=[RABBIT_HOST],
+                                               user=RABBIT_USERNAME,
+                                               password=RABBIT_PASSWORD,
+                                               ssl_context=ssl.create_default_context(),
+                                               virtual_host=RABBIT_VHOST,
+                                               prefetch_count=5)
+    output_manager = RabbitMQOutputDeviceManager(
+        hosts=[RABBIT_HOST],
+        user=RABBIT_USERNAME,
+        password=RABBIT_PASSWORD,
+        ssl_context=ssl.create_default_context(),
+        virtual_host=RABBIT_VHOST)
+
+    with input_manager, output_manager:
+        res = output_manager.create_queue('', auto_delete=False)
+        queue_name = res.method.queue
+        try:
+            output_device = output_manager.get_output_device(queue_name)
+            for i in range(5):
+                output_device.send_message(Message(str(i).encode()))
+            input_device = input_manager.get_input_device(queue_name)
+
+            with InputTransactionScope(input_device) as transaction_scope:
+                read_results = transaction_scope.read_messages(cancellation_token=Event(), timeout=1, max_batch=5)
+                assert len(read_results) == 5
+                transaction_scope.rollback()
+            assert all(read_result.transaction.finished for read_result in read_results)
+
+            with InputTransactionScope(input_device) as transaction_scope:
+                read_results = transaction_scope.read_messages(cancellation_token=Event(), timeout=1, max_batch=5)
+            assert {read_result.message.bytes for read_result in read_results} == {str(i).encode() for i in range(5)}
+
+            assert input_device.read_message(cancellation_token=Event(), timeout=1) is None
+        finally:
+            output_manager.delete_queue(queue_name, only_if_empty=False)
+
+
 def test_message_and_headers_size():
     mgr = RabbitMQOutputDeviceManager(hosts=[RABBIT_HOST],
                                       user=RABBIT_USERNAME,
@@ -3,16 +3,19 @@ import os
 import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from messageflux import InputDevice, ReadResult
 from messageflux.iodevices.base import OutputDevice, InputDeviceManager, OutputDeviceManager, InputTransactionScope
 from messageflux.iodevices.base.common import MessageBundle, Message
+from messageflux.iodevices.collection_device_wrapper.collection_output_device import CollectionOutputDevice
 from messageflux.iodevices.file_system import FileSystemInputDeviceManager, NoHeadersFileSystemSerializer, \
     FileSystemOutputDeviceManager
 from messageflux.iodevices.in_memory_device import InMemoryDeviceManager
 from messageflux.iodevices.round_robin_device_wrapper import RoundRobinInputDeviceManager, RoundRobinOutputDeviceManager
 from messageflux.utils import AggregatedException
+from .mocks import MockErrorOutputDevice
 
 DEFAULT_LOG_FORMATTER = logging.Formatter(u"%(asctime)-15s %(levelname)s %(message)s")
 DEFAULT_LOG_HANDLER = logging.StreamHandler(sys.stdout)
@@ -147,6 +150,64 @@ def test_order_input():
     assert streams == ['2c']
 
 
+def test_ready_notification():
+    device_name = 'TEST'
+    manager1 = InMemoryDeviceManager()
+    manager2 = InMemoryDeviceManager()
+    rri_manager = RoundRobinInputDeviceManager([manager1, manager2])
+    rrt = rri_manager.get_input_device(device_name)
+    rrt._SLEEP_BETWEEN_ITERATIONS = 30  # the read should be woken by the device, not by polling
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(rrt.read_message, cancellation_token=threading.Event(), timeout=30)
+        time.sleep(0.2)
+        start_time = time.perf_counter()
+        manager2.get_output_device(device_name).send_message(Message(b'data'))
+        res = future.result()
+        elapsed = time.perf_counter() - start_time
+
+    assert res is not None
+    assert res.message.bytes == b'data'
+    assert elapsed < 5
+    assert rrt.read_message(cancellation_token=threading.Event(), timeout=0.2) is None
+
+
+def test_cancelled_read():
+    rri_manager = RoundRobinInputDeviceManager([InMemoryDeviceManager(), InMemoryDeviceManager()])
+    rrt = rri_manager.get_input_device('TEST')
+    cancellation_token = threading.Event()
+    cancellation_token.set()
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(rrt.read_message, cancellation_token=cancellation_token, timeout=None)
+        assert future.result(timeout=5) is None
+
+
+def test_device_cache():
+    class _CountingInMemoryDeviceManager(InMemoryDeviceManager):
+        get_count = 0
+
+        def get_input_device(self, name):
+            self.get_count += 1
+            return super().get_input_device(name)
+
+        def get_output_device(self, name):
+            self.get_count += 1
+            return super().get_output_device(name)
+
+    inner_managers = [_CountingInMemoryDeviceManager(), _CountingInMemoryDeviceManager()]
+    rri_manager = RoundRobinInputDeviceManager(inner_managers)
+    rro_manager = RoundRobinOutputDeviceManager(inner_managers)
+
+    input_device = rri_manager.get_input_device('TEST')
+    output_device = rro_manager.get_output_device('TEST')
+    for _ in range(3):
+        assert rri_manager.get_input_device('TEST') is input_device
+        assert rro_manager.get_output_device('TEST') is output_device
+
+    assert all(inner_manager.get_count == 2 for inner_manager in inner_managers)
+
+
 def test_order_output():
     device_name = 'TEST'
     manager1 = InMemoryDeviceManager()
@@ -198,3 +259,29 @@ def test_all_error():
         except Exception as ex:
             assert isinstance(ex, AggregatedException)
             assert len(ex.inner_exceptions) == 2
+
+
+def test_failing_device_bypass():
+    failing_device = MockErrorOutputDevice('failing')
+    working_device = MockErrorOutputDevice('working')
+    working_device.should_fail = False
+    collection_device = CollectionOutputDevice(None, 'test', [failing_device, working_device])
+    collection_device._MAX_CONSECUTIVE_FAILURES = 3
+    collection_device._DEVICE_BYPASS_INTERVAL = 0.2
+
+    for _ in range(5):
+        collection_device.send_message(Message(b'data'))
+    assert failing_device.send_attempts == 3
+    assert working_device.send_attempts == 5
+
+    # the bypassed device is still tried, when all the other devices fail
+    working_device.should_fail = True
+    failing_device.should_fail = False
+    collection_device.send_message(Message(b'data'))
+    assert failing_device.send_attempts == 4
+    assert working_device.send_attempts == 6
+
+    # a successful send ends the bypass
+    collection_device.send_message(Message(b'data'))
+    assert failing_device.send_attempts == 5
+    assert working_device.send_attempts == 6
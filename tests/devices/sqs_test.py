@@ -4,6 +4,7 @@ from threading import Event
 import boto3
 from moto import mock_sqs
 
+from messageflux.iodevices.base import InputTransactionScope
 from messageflux.iodevices.sqs import SQSInputDeviceManager
 from messageflux.iodevices.sqs import SQSOutputDeviceManager
 from tests.devices.common import sanity_test, rollback_test
@@ -58,3 +59,38 @@ def test_empty_headers():
             assert rr.message.bytes.decode() == test_message
         finally:
             q.delete()
+
+
+@mock_sqs
+def test_transaction_scope_batch():
+    sqs_resource = boto3.resource('sqs', region_name='us-west-2')
+    input_manager = SQSInputDeviceManager(sqs_resource=sqs_resource, max_messages_per_request=10)
+    output_manager = SQSOutputDeviceManager(sqs_resource=sqs_resource)
+    queue_name = str(uuid.uuid4())
+    with input_manager, output_manager:
+        q = output_manager.create_queue(queue_name)
+        try:
+            for i in range(12):
+                q.send_message(MessageBody=str(i))
+            input_device = input_manager.get_input_device(queue_name)
+
+            with InputTransactionScope(input_device) as transaction_scope:
+                read_results = []
+                for _ in range(12):
+                    read_result = transaction_scope.read_message(cancellation_token=Event(), timeout=0)
+                    assert read_result is not None
+                    read_results.append(read_result)
+                transaction_scope.rollback()
+            assert all(read_result.transaction.finished for read_result in read_results)
+
+            with InputTransactionScope(input_device) as transaction_scope:
+                bodies = set()
+                for _ in range(12):
+                    read_result = transaction_scope.read_message(cancellation_token=Event(), timeout=0)
+                    assert read_result is not None
+                    bodies.add(read_result.message.bytes.decode())
+            assert bodies == {str(i) for i in range(12)}
+
+            assert input_device.read_message(cancellation_token=Event(), timeout=0) is None
+        finally:
+            q.delete()
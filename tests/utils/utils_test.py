@@ -1,8 +1,14 @@
+import datetime
+import json
+import math
+import os
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
 
 import pytest
 
-from messageflux.utils import ThreadLocalMember
+from messageflux.utils import ThreadLocalMember, json_dumps_bytes, json_safe_encoder, json_loads, get_random_id
 
 executor = ThreadPoolExecutor()
 
@@ -59,3 +65,65 @@ def test_thread_local_member():
 
     assert a.prop1 == 11
     assert b.prop1 == 11
+
+
+def test_json_dumps_bytes():
+    obj = {'str': 'a\nb', 'int': 1, 'float': 1.5, 'bool': True, 'none': None, 'list': [1, 'a'], 1: 'int key',
+           'date': datetime.date(2020, 1, 2), 'time': datetime.time(3, 4, 5), 'bytes': b'bytes',
+           'big_int': 2 ** 70}
+    data = json_dumps_bytes(obj)
+    assert isinstance(data, bytes)
+    assert b'\n' not in data
+    assert json.loads(data) == {'str': 'a\nb', 'int': 1, 'float': 1.5, 'bool': True, 'none': None, 'list': [1, 'a'],
+                                '1': 'int key', 'date': '2020-01-02', 'time': '03:04', 'bytes': 'bytes',
+                                'big_int': 2 ** 70}
+
+
+def test_json_dumps_bytes_matches_json():
+    class PlainEnum(Enum):
+        A = 'a'
+
+    class StrEnum(str, Enum):
+        B = 'b'
+
+    obj = {'plain_enum': PlainEnum.A, 'str_enum': StrEnum.B, 'nan': float('nan'), 'inf': float('inf'),
+           'nested': {'list': [PlainEnum.A, 1.5]}}
+    data = json_dumps_bytes(obj)
+    assert data == json.dumps(obj, default=json_safe_encoder).encode()
+    assert json.loads(data)['plain_enum'] == 'PlainEnum.A'
+    assert json.loads(data)['str_enum'] == 'b'
+    assert json.loads(data)['inf'] == float('inf')
+
+    # orjson serializes dict subclasses natively, so their values must be checked as well
+    ordered_obj = OrderedDict(nan=float('nan'), nested=[OrderedDict(plain_enum=PlainEnum.A)])
+    assert json_dumps_bytes(ordered_obj) == json.dumps(ordered_obj, default=json_safe_encoder).encode()
+
+
+def test_json_loads():
+    data = b'{"a": [1, "b", null], "big_int": 1180591620717411303424}'
+    assert json_loads(data) == {'a': [1, 'b', None], 'big_int': 2 ** 70}
+    assert json_loads('{"a": 1}') == {'a': 1}
+    assert math.isinf(json_loads(b'{"inf": Infinity}')['inf'])
+
+
+def test_get_random_id_unique():
+    random_ids = list(executor.map(lambda _: get_random_id(), range(1000)))
+    random_ids.extend(get_random_id() for _ in range(1000))
+    assert len(set(random_ids)) == len(random_ids)
+    assert all(len(random_id) == 32 for random_id in random_ids)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork is not available')
+def test_get_random_id_after_fork():
+    get_random_id()  # makes sure the parent has prefetched ids
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_fd, get_random_id().encode())
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    with os.fdopen(read_fd, 'rb') as f:
+        child_id = f.read().decode()
+    assert len(child_id) == 32
+    assert child_id != get_random_id()